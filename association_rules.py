@@ -1,24 +1,205 @@
+import heapq
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
 
+import numpy as np
+
+from rule_set import RuleSet
+
+_MISSING = object()
+
+
+class ClosedSupportLookup:
+    """
+    Tra cứu support của một itemset từ tập frequent itemsets.
+    
+    Nếu itemset có sẵn trong dictionary thì trả về trực tiếp; nếu không
+    (đầu vào là closed itemsets từ mine_fp_tree(mode='closed')), support
+    bằng support lớn nhất trong các superset của nó. Với đầu vào đầy đủ
+    (mode='all') nhánh suy diễn không bao giờ được dùng.
+    """
+    def __init__(self, itemset_support):
+        """
+        Args:
+            itemset_support: Dictionary {frozenset: support}
+        """
+        self.itemset_support = dict(itemset_support)
+        self._itemsets = list(itemset_support.items())
+        self._item_index = None
+    
+    def _build_index(self):
+        self._item_index = defaultdict(set)
+        for idx, (itemset, _) in enumerate(self._itemsets):
+            for item in itemset:
+                self._item_index[item].add(idx)
+    
+    def get(self, itemset):
+        """
+        Lấy support của itemset.
+        
+        Args:
+            itemset: frozenset các items
+        
+        Returns:
+            Support, hoặc None nếu itemset không phổ biến
+        """
+        if itemset in self.itemset_support:
+            return self.itemset_support[itemset]
+        
+        support = None
+        if self._item_index is None:
+            self._build_index()
+        
+        postings = [self._item_index.get(item, set()) for item in itemset]
+        postings.sort(key=len)
+        if not postings or not postings[0]:
+            return None
+        
+        supersets = postings[0].intersection(*postings[1:])
+        if supersets:
+            support = max(self._itemsets[idx][1] for idx in supersets)
+        # Lưu lại kết quả (kể cả None) để lần sau không phải tính lại
+        self.itemset_support[itemset] = support
+        return support
+    
+    def get_many(self, itemsets):
+        """
+        Lấy support của nhiều itemsets (None cho itemset không phổ biến).
+        
+        Args:
+            itemsets: List các frozensets
+        
+        Returns:
+            List các supports
+        """
+        table_get = self.itemset_support.get
+        supports = [table_get(itemset, _MISSING) for itemset in itemsets]
+        for idx, support in enumerate(supports):
+            if support is _MISSING:
+                supports[idx] = self.get(itemsets[idx])
+        return supports
+
+
+class TopRulesHeap:
+    """
+    Giữ max_rules rules tốt nhất bằng min-heap có kích thước giới hạn.
+    
+    Thứ tự giống hệt khi sort toàn bộ theo (quality_score, lift) giảm dần
+    rồi cắt max_rules: các rules bằng điểm được ưu tiên theo thứ tự được
+    đưa vào. Bộ nhớ O(max_rules) thay vì O(số rules ứng viên).
+    """
+    def __init__(self, max_rules=None):
+        """
+        Args:
+            max_rules: Số lượng rules tối đa (None = không giới hạn)
+        """
+        self.max_rules = max_rules
+        self._heap = []
+        self._counter = 0
+    
+    def __len__(self):
+        return len(self._heap)
+    
+    def accepts(self, quality_score, lift):
+        """
+        Kiểm tra một rule có điểm (quality_score, lift) có vào được heap không.
+        
+        Returns:
+            True nếu heap chưa đầy hoặc rule tốt hơn rule kém nhất hiện có
+        """
+        if self.max_rules is None or len(self._heap) < self.max_rules:
+            return True
+        if self.max_rules <= 0:
+            return False
+        worst_quality, worst_lift, _, _ = self._heap[0]
+        # Bằng điểm thì rule đến sau bị loại (giống sort ổn định)
+        return (quality_score, lift) > (worst_quality, worst_lift)
+    
+    def push(self, rule):
+        """
+        Đưa rule (đã có quality_score và lift) vào heap.
+        
+        Returns:
+            True nếu rule được giữ lại
+        """
+        quality_score = rule['quality_score']
+        lift = rule['lift']
+        if not self.accepts(quality_score, lift):
+            return False
+        
+        # -counter: khi bằng điểm, rule đến sau là rule "kém hơn"
+        entry = (quality_score, lift, -self._counter, rule)
+        self._counter += 1
+        if self.max_rules is None or len(self._heap) < self.max_rules:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+    
+    def rules_in_order(self):
+        """
+        Lấy các rules đã giữ theo đúng thứ tự được đưa vào.
+        
+        Đưa lần lượt kết quả này vào một TopRulesHeap khác cho kết quả
+        giống như đưa toàn bộ rules gốc (dùng khi gộp các shards).
+        
+        Returns:
+            List các rules
+        """
+        return [entry[3] for entry in sorted(self._heap, key=lambda x: x[2], reverse=True)]
+    
+    def sorted_rules(self):
+        """
+        Lấy các rules đã giữ, sắp xếp theo quality_score rồi lift giảm dần.
+        
+        Returns:
+            List các rules
+        """
+        return [entry[3] for entry in sorted(self._heap, key=lambda x: x[:3], reverse=True)]
+
 
 def filter_rules_by_quality(rules, config):
     """
     Lọc rules theo nhiều tiêu chí chất lượng.
     
+    Rules được duyệt một lần và chỉ max_rules rules tốt nhất được giữ
+    trong TopRulesHeap, nên rules có thể là generator. Các rules được giữ
+    được bổ sung quality_score và complexity tại chỗ.
+    
     Args:
-        rules: List các rules chưa lọc
+        rules: Iterable các rules chưa lọc hoặc RuleSet
         config: Dictionary chứa các ngưỡng lọc
             - min_lift: Ngưỡng lift tối thiểu
             - min_quality_score: Ngưỡng quality score tối thiểu
             - max_rules: Số lượng rules tối đa
     
     Returns:
-        List các rules đã lọc và sắp xếp theo chất lượng
+        List các rules đã lọc và sắp xếp theo chất lượng (RuleSet nếu
+        rules là RuleSet)
+    """
+    if isinstance(rules, RuleSet):
+        return rules.filter(
+            min_lift=config.get('min_lift', 1.0),
+            min_quality_score=config.get('min_quality_score', 0.0),
+            max_rules=config.get('max_rules')
+        )
+    
+    # Sắp xếp theo quality_score giảm dần, sau đó theo lift
+    return _select_top_rules(rules, config).sorted_rules()
+
+
+def _select_top_rules(rules, config):
     """
-    filtered_rules = []
+    Áp dụng ngưỡng lift / quality score và giữ max_rules rules tốt nhất.
     
+    Returns:
+        TopRulesHeap chứa các rules được giữ
+    """
     min_lift = config.get('min_lift', 1.0)
     min_quality_score = config.get('min_quality_score', 0.0)
+    top_rules = TopRulesHeap(config.get('max_rules'))
     
     for rule in rules:
         if rule['lift'] < min_lift:
@@ -26,25 +207,186 @@ def filter_rules_by_quality(rules, config):
         quality_score = rule['confidence'] * rule['lift']
         if quality_score < min_quality_score:
             continue
+        if not top_rules.accepts(quality_score, rule['lift']):
+            continue
         
-        total_items = len(rule['antecedents']) + len(rule['consequents'])
-        complexity = total_items
+        rule['quality_score'] = quality_score
+        rule['complexity'] = len(rule['antecedents']) + len(rule['consequents'])
+        top_rules.push(rule)
+    
+    return top_rules
+
+
+def _next_consequents(consequents):
+    """
+    Sinh consequents độ dài k+1 từ các consequents độ dài k đã đạt
+    min_confidence (apriori-gen): chỉ giữ ứng viên mà mọi tập con độ dài k
+    đều đã đạt.
+    
+    Args:
+        consequents: List các frozensets cùng độ dài k
+    
+    Returns:
+        List các frozensets độ dài k+1
+    """
+    passed = set(consequents)
+    
+    # Hai consequents chỉ ghép được nếu chung k-1 items: gom theo phần chung
+    buckets = defaultdict(list)
+    for consequent in consequents:
+        for item in consequent:
+            buckets[consequent - {item}].append(item)
+    
+    candidates = []
+    seen = set()
+    for base, extras in buckets.items():
+        for first, second in combinations(extras, 2):
+            candidate = base | {first, second}
+            if candidate in seen:
+                continue
+            seen.add(candidate)
+            if all(candidate - {item} in passed for item in candidate):
+                candidates.append(candidate)
+    
+    return candidates
+
+
+def generate_itemset_rules(itemset, itemset_support, min_confidence, min_lift, prune=True):
+    """
+    Sinh các rules từ một itemset, mở rộng consequent theo từng mức.
+    
+    Confidence của X\C -> C giảm khi C lớn lên (anti-monotone theo
+    consequent), nên một consequent không đạt min_confidence thì mọi
+    consequent chứa nó cũng không đạt và không cần xét. Điều này chỉ đúng
+    khi support giảm dần theo quan hệ tập con (xem _supports_anti_monotone);
+    nếu không, prune=False sẽ xét mọi consequent.
+    
+    Args:
+        itemset: frozenset (hoặc tuple) các items, ít nhất 2 items
+        itemset_support: ClosedSupportLookup hoặc dictionary chứa support (tỉ lệ)
+        min_confidence: Ngưỡng confidence tối thiểu
+        min_lift: Ngưỡng lift tối thiểu
+        prune: Bỏ qua consequents chứa một consequent không đạt min_confidence
+    
+    Returns:
+        List các rules theo cùng thứ tự với cách duyệt mọi
+        combinations(items, i) (antecedent ngắn trước)
+    """
+    items = list(itemset)
+    itemset = frozenset(itemset)
+    position = {item: idx for idx, item in enumerate(items)}
+    support = itemset_support.get(itemset)
+    
+    rules = []
+    consequents = [frozenset([item]) for item in items]
+    
+    while consequents:
+        passed = []
         
-        filtered_rules.append({
-            **rule,
-            'quality_score': quality_score,
-            'complexity': complexity
-        })
+        for consequent in consequents:
+            antecedent = frozenset(item for item in items if item not in consequent)
+            
+            # Antecedent phải có trong frequent_itemsets
+            antecedent_support = itemset_support.get(antecedent)
+            
+            if not antecedent_support:
+                continue
+            
+            confidence = support / antecedent_support
+            
+            if confidence < min_confidence:
+                continue
+            passed.append(consequent)
+            
+            # Confidence phải <= 1.0
+            if confidence > 1.0:
+                continue
+            
+            # Consequent phải có trong frequent_itemsets
+            consequent_support = itemset_support.get(consequent)
+            
+            if consequent_support is None:
+                continue
+            
+            if consequent_support == 0:
+                lift = 0
+            else:
+                lift = confidence / consequent_support
+            
+            # Lọc theo lift ngay từ đầu
+            if lift < min_lift:
+                continue
+            
+            rules.append({
+                'antecedents': set(antecedent),
+                'consequents': set(itemset - antecedent),
+                'support': support,
+                'confidence': confidence,
+                'lift': lift
+            })
+        
+        # Antecedent phải khác rỗng: consequent tối đa len(items) - 1 items
+        size = len(consequents[0]) + 1
+        if not prune and size < len(items):
+            consequents = [frozenset(combo) for combo in combinations(items, size)]
+        elif passed and size < len(items):
+            consequents = _next_consequents(passed)
+        else:
+            consequents = []
     
-    # Sắp xếp theo quality_score giảm dần, sau đó theo lift
-    filtered_rules.sort(
-        key=lambda x: (x['quality_score'], x['lift']), 
-        reverse=True
-    )
+    # Giữ thứ tự rules như khi duyệt combinations(items, i)
+    rules.sort(key=lambda rule: (
+        len(rule['antecedents']),
+        sorted(position[item] for item in rule['antecedents'])
+    ))
+    return rules
+
+
+def _iter_rules(itemsets, itemset_support, min_confidence, min_lift, prune=True):
+    """Sinh lần lượt rules của các itemsets có ít nhất 2 items."""
+    for itemset in itemsets:
+        if len(itemset) < 2:
+            continue
+        yield from generate_itemset_rules(
+            itemset, itemset_support, min_confidence, min_lift, prune
+        )
+
+
+def _supports_anti_monotone(itemset_support):
+    """
+    Kiểm tra mọi tập con bớt một item của mỗi itemset đều có trong bảng với
+    support không nhỏ hơn support của itemset.
+    
+    Luôn đúng với frequent itemsets đầy đủ trên transactions dạng tập hợp.
+    Khi trip ghé lại một vị trí không liền kề, FP-tree đếm item lặp lại
+    nhiều lần và điều kiện có thể bị vi phạm; khi đó cắt tỉa consequent
+    (và suy support từ supersets) sẽ làm mất hoặc sai rules.
+    """
+    for itemset, support in itemset_support.items():
+        if len(itemset) < 2:
+            continue
+        for item in itemset:
+            subset_support = itemset_support.get(itemset - {item})
+            if subset_support is None or subset_support < support:
+                return False
+    return True
+
+
+def _rule_support_lookup(itemset_support, config):
+    """
+    Chọn cách tra support cho việc sinh rules.
+    
+    Closed itemsets (config['itemset_mode'] == 'closed') hoặc bảng thỏa
+    _supports_anti_monotone: ClosedSupportLookup và cắt tỉa consequent.
+    Ngược lại: tra trực tiếp trên dictionary và xét mọi consequent, giống
+    cách duyệt mọi combinations(items, i).
     
-    # Giới hạn số lượng rules
-    max_rules = config.get('max_rules', len(filtered_rules))
-    return filtered_rules[:max_rules]
+    Returns:
+        Tuple (itemset_support, prune)
+    """
+    if config.get('itemset_mode') == 'closed' or _supports_anti_monotone(itemset_support):
+        return ClosedSupportLookup(itemset_support), True
+    return itemset_support, False
 
 
 def generate_association_rules(frequent_itemsets, total_transactions, config):
@@ -70,78 +412,507 @@ def generate_association_rules(frequent_itemsets, total_transactions, config):
             - lift: Lift của rule
             - quality_score: Quality score của rule
     """
-    rules = []
-    
     min_confidence = config['min_confidence']
     min_lift = config.get('min_lift', 1.0)
     
-    # Tính support cho mỗi itemset
-    itemset_support = {
+    # Tính support cho mỗi itemset (suy ra được cả từ closed itemsets)
+    itemset_support, prune = _rule_support_lookup({
         itemset: count / total_transactions 
         for itemset, count in frequent_itemsets.items()
-    }
+    }, config)
     
-    # Tạo rules từ các itemsets có ít nhất 2 items
-    for itemset in frequent_itemsets:
-        if len(itemset) < 2:
-            continue
-        
-        items = list(itemset)
-        
-        # Tạo tất cả các cách chia itemset thành antecedent và consequent
-        for i in range(1, len(items)):
-            for antecedent_items in combinations(items, i):
-                antecedent = frozenset(antecedent_items)
-                consequent = itemset - antecedent
-                
-                if not consequent:
-                    continue
-                
-                # Tính các metrics
-                support = itemset_support[itemset]
-                
-                # Antecedent phải có trong frequent_itemsets
-                if antecedent not in itemset_support:
-                    continue
-                    
-                antecedent_support = itemset_support[antecedent]
-                
-                if antecedent_support == 0:
-                    continue
-                
-                confidence = support / antecedent_support
-                
-                # Confidence phải <= 1.0
-                if confidence > 1.0:
-                    continue
-                
-                if confidence < min_confidence:
-                    continue
-                
-                # Consequent phải có trong frequent_itemsets
-                if consequent not in itemset_support:
-                    continue
-                    
-                consequent_support = itemset_support[consequent]
-                
-                if consequent_support == 0:
-                    lift = 0
-                else:
-                    lift = confidence / consequent_support
-                
-                # Lọc theo lift ngay từ đầu
-                if lift < min_lift:
-                    continue
-                
-                rules.append({
-                    'antecedents': set(antecedent),
-                    'consequents': set(consequent),
-                    'support': support,
-                    'confidence': confidence,
-                    'lift': lift
-                })
-    
-    # Áp dụng lọc thông minh theo quality score
+    # Tạo rules từ các itemsets có ít nhất 2 items (sinh dần, không giữ hết)
+    rules = _iter_rules(frequent_itemsets, itemset_support, min_confidence, min_lift, prune)
+    
+    # Áp dụng lọc thông minh theo quality score (top max_rules bằng heap)
     filtered_rules = filter_rules_by_quality(rules, config)
     
     return filtered_rules
+
+
+def prune_redundant_rules(rules):
+    """
+    Loại các rules dư thừa (lọc theo antecedent tối thiểu).
+    
+    Rule X -> Y là dư thừa nếu trong rules có rule X' -> Y với X' là tập
+    con thực sự của X và confidence >= confidence của X -> Y: rule tổng
+    quát hơn đã dự đoán Y ít nhất tốt bằng mà cần ít điều kiện hơn.
+    Thứ tự các rules còn lại được giữ nguyên.
+    
+    Lưu ý: việc loại rules không bảo toàn kết quả dự đoán.
+    predict_next_locations cộng dồn điểm từ mọi rule khớp, nên bỏ
+    {A,B} -> {C} làm giảm điểm của C khi path chứa cả A và B, có thể
+    thay đổi thứ hạng ứng viên và Precision@K / MRR.
+    
+    Args:
+        rules: List các rules (antecedents / consequents là set) hoặc RuleSet
+    
+    Returns:
+        List các rules không dư thừa (RuleSet nếu rules là RuleSet)
+    """
+    # Confidence tốt nhất theo (consequent, antecedent)
+    by_consequent = defaultdict(dict)
+    for rule in rules:
+        antecedent = frozenset(rule['antecedents'])
+        best = by_consequent[frozenset(rule['consequents'])]
+        if rule['confidence'] > best.get(antecedent, -1.0):
+            best[antecedent] = rule['confidence']
+    
+    kept = []
+    for idx, rule in enumerate(rules):
+        antecedent = frozenset(rule['antecedents'])
+        best = by_consequent[frozenset(rule['consequents'])]
+        confidence = rule['confidence']
+        
+        # Duyệt cách rẻ hơn: các tập con của antecedent hoặc các rules cùng consequent
+        if (1 << len(antecedent)) <= len(best):
+            generalizations = (
+                frozenset(subset)
+                for size in range(1, len(antecedent))
+                for subset in combinations(antecedent, size)
+            )
+            redundant = any(
+                best.get(subset, -1.0) >= confidence for subset in generalizations
+            )
+        else:
+            redundant = any(
+                other_confidence >= confidence and other < antecedent
+                for other, other_confidence in best.items()
+            )
+        
+        if not redundant:
+            kept.append(idx)
+    
+    if isinstance(rules, RuleSet):
+        return rules.select(kept)
+    return [rules[idx] for idx in kept]
+
+
+_worker_rules_state = None
+
+
+def _init_rules_worker(item_lists, counts, total_transactions, config):
+    """
+    Initializer cho worker sinh rules: nhận bảng itemsets một lần và dựng
+    bảng tra support (cùng bảng mã hóa nếu sinh rules theo lô) một lần.
+    """
+    global _worker_rules_state
+    _worker_rules_state = (
+        item_lists,
+        _prepare_rule_generation(
+            item_lists, counts, total_transactions, config, config.get('vectorized_rules')
+        ),
+        config
+    )
+
+
+def _generate_shard_rules(shard):
+    """
+    Worker: sinh rules cho một shard itemsets và giữ top max_rules.
+    
+    Args:
+        shard: Tuple (start, stop), chỉ số các itemsets của shard
+    
+    Returns:
+        List các rules được giữ, theo thứ tự sinh
+    """
+    item_lists, (itemset_support, prune, table), config = _worker_rules_state
+    start, stop = shard
+    if table is not None:
+        return table.top_rules(config, start, stop, in_order=True)
+    
+    rules = _iter_rules(
+        item_lists[start:stop], itemset_support,
+        config['min_confidence'], config.get('min_lift', 1.0), prune
+    )
+    return _select_top_rules(rules, config).rules_in_order()
+
+
+def _shard_itemsets(itemsets, n_shards):
+    """
+    Chia itemsets thành tối đa n_shards đoạn liên tiếp có chi phí gần bằng
+    nhau. Chi phí một itemset ước lượng bằng 2^len (số rules ứng viên).
+    
+    Returns:
+        List các đoạn (start, stop), theo thứ tự ban đầu
+    """
+    costs = [1 << len(itemset) if len(itemset) >= 2 else 0 for itemset in itemsets]
+    target = sum(costs) / n_shards
+    
+    shards = []
+    start = 0
+    load = 0
+    for idx, cost in enumerate(costs):
+        load += cost
+        if load >= target:
+            shards.append((start, idx + 1))
+            start = idx + 1
+            load = 0
+    if start < len(costs):
+        shards.append((start, len(costs)))
+    return shards
+
+
+def generate_association_rules_parallel(frequent_itemsets, total_transactions, config,
+                                        n_workers=None):
+    """
+    Sinh association rules song song theo shards itemsets.
+    
+    Rules của mỗi itemset chỉ phụ thuộc vào bảng support (chỉ đọc), nên
+    itemsets được chia thành các shards liên tiếp và xử lý trên một
+    process pool. Bảng itemsets được gửi tới mỗi worker đúng một lần qua
+    initializer, mỗi shard chỉ là một đoạn chỉ số; mỗi worker trả về top
+    max_rules rules của shard, sau đó được gộp theo thứ tự shard. Với
+    config['vectorized_rules'], mỗi worker sinh rules theo lô như
+    generate_association_rules_batch. Kết quả giống hệt
+    generate_association_rules.
+    
+    Args:
+        frequent_itemsets: Dictionary của frequent itemsets và support counts
+        total_transactions: Tổng số transactions
+        config: Dictionary chứa cấu hình (như generate_association_rules)
+        n_workers: Số processes (mặc định config['n_jobs'] hoặc số CPU)
+    
+    Returns:
+        List các rules đã lọc và sắp xếp theo chất lượng
+    """
+    if n_workers is None:
+        n_workers = config.get('n_jobs') or os.cpu_count() or 1
+    
+    # Gửi dạng list: frozenset dựng lại trong worker có thể duyệt items theo
+    # thứ tự khác, làm đổi thứ tự rules (và thứ tự các rules bằng điểm)
+    item_lists = [list(itemset) for itemset in frequent_itemsets]
+    if n_workers <= 1 or sum(len(items) >= 2 for items in item_lists) < 2:
+        if config.get('vectorized_rules'):
+            return generate_association_rules_batch(frequent_itemsets, total_transactions, config)
+        return generate_association_rules(frequent_itemsets, total_transactions, config)
+    
+    # Nhiều shards hơn số workers để cân bằng tải
+    shards = _shard_itemsets(item_lists, n_workers * 4)
+    
+    top_rules = TopRulesHeap(config.get('max_rules'))
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_rules_worker,
+        initargs=(item_lists, list(frequent_itemsets.values()), total_transactions, config)
+    ) as executor:
+        for shard_rules in executor.map(_generate_shard_rules, shards):
+            for rule in shard_rules:
+                top_rules.push(rule)
+    
+    return top_rules.sorted_rules()
+
+
+def _row_keys(rows, value_bits):
+    """
+    Khóa so sánh được (để sort / searchsorted) cho mỗi hàng của mảng 2 chiều
+    các số nguyên không âm.
+    
+    Args:
+        rows: Mảng 2 chiều
+        value_bits: Số bit đủ để biểu diễn mọi giá trị trong rows
+    
+    Returns:
+        np.ndarray int64 (ghép các giá trị của hàng nếu vừa 63 bits),
+        ngược lại np.void (các bytes của hàng)
+    """
+    if value_bits * rows.shape[1] <= 63:
+        keys = np.zeros(len(rows), dtype=np.int64)
+        for column in rows.T:
+            keys = (keys << value_bits) | column
+        return keys
+    rows = np.ascontiguousarray(rows)
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
+
+def _find_keys(sorted_keys, keys):
+    """
+    Vị trí của mỗi khóa trong sorted_keys (đã sắp xếp), -1 nếu không có.
+    """
+    if not len(sorted_keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[positions] == keys, positions, -1)
+
+
+def _prepare_rule_generation(itemsets, counts, total_transactions, config, vectorized):
+    """
+    Dựng bảng tra support cho việc sinh rules, và bảng itemsets đã mã hóa
+    nếu sinh rules theo lô (vectorized) dùng được.
+    
+    Args:
+        itemsets: List các itemsets (frozenset hoặc list items)
+        counts: Support counts song song với itemsets
+        total_transactions: Tổng số transactions
+        config: Dictionary chứa cấu hình
+        vectorized: Có dựng _BatchRuleTable hay không
+    
+    Returns:
+        Tuple (itemset_support, prune, table) với table là _BatchRuleTable,
+        hoặc None nếu không sinh theo lô được
+    """
+    supports = [count / total_transactions for count in counts]
+    itemset_support, prune = _rule_support_lookup(
+        dict(zip(map(frozenset, itemsets), supports)), config
+    )
+    
+    table = None
+    # Cắt tỉa theo mức chỉ chính xác khi prune (xem _rule_support_lookup)
+    if vectorized and prune:
+        table = _BatchRuleTable.build(itemsets, supports, itemset_support)
+    return itemset_support, prune, table
+
+
+class _BatchRuleTable:
+    """
+    Itemsets mã hóa thành mảng cho việc sinh rules theo lô.
+    
+    Hàng thứ i là item IDs của itemsets[i] theo thứ tự items (đệm bằng
+    pad); bảng tra support gồm các hàng đã sắp xếp (dạng chuẩn của
+    itemset) và được tra bằng searchsorted. Dựng một lần rồi sinh rules
+    cho toàn bộ hoặc từng đoạn itemsets (các shards của bản song song).
+    """
+    def __init__(self, itemsets, supports, itemset_support):
+        """
+        Args:
+            itemsets: List các itemsets (frozenset hoặc list items); thứ tự
+                items quyết định thứ tự rules như generate_itemset_rules
+            supports: Support (tỉ lệ) song song với itemsets
+            itemset_support: ClosedSupportLookup cho các tập con không có
+                trong bảng (đầu vào closed itemsets)
+        """
+        self.item_lists = [list(itemset) for itemset in itemsets]
+        self.itemsets = [frozenset(itemset) for itemset in itemsets]
+        self.itemset_support = itemset_support
+        self.supports = np.asarray(supports, dtype=np.float64)
+        self.lengths = np.array([len(items) for items in self.item_lists], dtype=np.int64)
+        self.width = width = int(self.lengths.max())
+        
+        item_ids = {}
+        flat_ids = [item_ids.setdefault(item, len(item_ids)) for items in self.item_lists for item in items]
+        self.vocabulary = list(item_ids)
+        self.pad = len(self.vocabulary)
+        self.valid = np.arange(width) < self.lengths[:, None]
+        self.rows = np.full((len(self.item_lists), width), self.pad, dtype=np.int64)
+        self.rows[self.valid] = flat_ids
+        self.item_bits = self.pad.bit_length()
+        self.pair_bits = max(width, len(self.item_lists).bit_length())
+        
+        table_keys = _row_keys(np.sort(self.rows, axis=1), self.item_bits)
+        table_order = np.argsort(table_keys, kind='stable')
+        self.table_keys = table_keys[table_order]
+        self.table_supports = self.supports[table_order]
+        
+        self.bits = np.left_shift(np.int64(1), np.arange(width, dtype=np.int64))
+    
+    @classmethod
+    def build(cls, itemsets, supports, itemset_support):
+        """
+        Dựng bảng, hoặc trả về None nếu không có itemset nào có ít nhất 2
+        items hay có itemset dài hơn 62 items (bitmask vị trí không vừa int64).
+        """
+        width = max((len(itemset) for itemset in itemsets), default=0)
+        if width < 2 or width > 62:
+            return None
+        return cls(itemsets, supports, itemset_support)
+    
+    def _subset_supports(self, candidate_idx, masks, inside):
+        """Support của phần items trong (inside) / ngoài bitmask; NaN nếu không phổ biến."""
+        in_mask = (masks[:, None] & self.bits) != 0
+        keep = (in_mask if inside else ~in_mask) & self.valid[candidate_idx]
+        subsets = np.sort(np.where(keep, self.rows[candidate_idx], self.pad), axis=1)
+        found = _find_keys(self.table_keys, _row_keys(subsets, self.item_bits))
+        result = np.where(found >= 0, self.table_supports[found], np.nan)
+        
+        # Đầu vào closed itemsets: suy support từ các supersets
+        missing = np.flatnonzero(found < 0)
+        if missing.size:
+            lookups = self.itemset_support.get_many([
+                frozenset(self.vocabulary[item_id] for item_id in row if item_id != self.pad)
+                for row in subsets[missing].tolist()
+            ])
+            result[missing] = [np.nan if support is None else support for support in lookups]
+        return result
+    
+    def _kept_rules(self, config, start, stop):
+        """
+        Các rules đạt mọi ngưỡng của itemsets[start:stop], theo thứ tự duyệt
+        gốc (itemset, độ dài antecedent, thứ tự combinations).
+        
+        Returns:
+            Tuple các mảng (chỉ số itemset, bitmask consequent, support,
+            confidence, lift), hoặc None nếu không có rule nào
+        """
+        min_confidence = config['min_confidence']
+        min_lift = config.get('min_lift', 1.0)
+        min_quality_score = config.get('min_quality_score', 0.0)
+        lengths = self.lengths
+        bits = self.bits
+        
+        # Ứng viên mức 1: consequent một item
+        multi = start + np.flatnonzero(lengths[start:stop] >= 2)
+        candidate_idx = np.repeat(multi, lengths[multi])
+        starts = np.repeat(np.cumsum(lengths[multi]) - lengths[multi], lengths[multi])
+        masks = bits[np.arange(len(candidate_idx)) - starts]
+        level = 1
+        
+        kept = []
+        
+        while len(candidate_idx):
+            rule_supports = self.supports[candidate_idx]
+            antecedent_supports = self._subset_supports(candidate_idx, masks, inside=False)
+            consequent_supports = self._subset_supports(candidate_idx, masks, inside=True)
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                confidences = np.where(
+                    antecedent_supports > 0, rule_supports / antecedent_supports, 0.0
+                )
+                lifts = np.where(
+                    consequent_supports > 0, confidences / consequent_supports, 0.0
+                )
+            quality_scores = confidences * lifts
+            
+            passed_confidence = (antecedent_supports > 0) & (confidences >= min_confidence)
+            rule_mask = (
+                passed_confidence
+                & (confidences <= 1.0)
+                & ~np.isnan(consequent_supports)
+                & (lifts >= min_lift)
+                & (quality_scores >= min_quality_score)
+            )
+            kept.append((
+                candidate_idx[rule_mask], masks[rule_mask], rule_supports[rule_mask],
+                confidences[rule_mask], lifts[rule_mask]
+            ))
+            
+            # Mức tiếp theo chỉ mở rộng các consequents đạt min_confidence, và
+            # antecedent phải khác rỗng: consequent tối đa len(items) - 1 items
+            level += 1
+            expandable = passed_confidence & (lengths[candidate_idx] > level)
+            passed_idx = candidate_idx[expandable]
+            passed_masks = masks[expandable]
+            
+            # Mỗi ứng viên sinh đúng một lần: thêm một vị trí cao hơn mọi bit
+            # hiện có của consequent đã đạt
+            next_idx = []
+            next_masks = []
+            for position in range(1, self.width):
+                extend = (passed_masks < bits[position]) & (lengths[passed_idx] > position)
+                next_idx.append(passed_idx[extend])
+                next_masks.append(passed_masks[extend] | bits[position])
+            candidate_idx = np.concatenate(next_idx)
+            masks = np.concatenate(next_masks)
+            
+            # Apriori-gen: mọi tập con bớt một item của consequent đều phải đạt
+            passed_keys = np.sort(_row_keys(np.column_stack((passed_idx, passed_masks)), self.pair_bits))
+            complete = np.ones(len(candidate_idx), dtype=bool)
+            for bit in bits.tolist():
+                has_bit = (masks & bit) != 0
+                subsets = np.column_stack((candidate_idx[has_bit], masks[has_bit] ^ bit))
+                complete[has_bit] &= _find_keys(passed_keys, _row_keys(subsets, self.pair_bits)) >= 0
+            candidate_idx = candidate_idx[complete]
+            masks = masks[complete]
+        
+        if not kept:
+            return None
+        kept_idx, kept_masks, kept_supports, confidences, lifts = (
+            np.concatenate(column) for column in zip(*kept)
+        )
+        if not len(kept_idx):
+            return None
+        
+        # Khôi phục thứ tự duyệt gốc để sort ổn định cho kết quả giống hệt.
+        # Với cùng độ dài, thứ tự combinations tăng dần ứng với bitmask vị
+        # trí đảo ngược giảm dần.
+        consequent_lengths = np.zeros(len(kept_idx), dtype=np.int64)
+        reversed_masks = np.zeros(len(kept_idx), dtype=np.int64)
+        last_positions = lengths[kept_idx] - 1
+        for position, bit in enumerate(bits.tolist()):
+            has_bit = (kept_masks & bit) != 0
+            consequent_lengths += has_bit
+            reversed_masks |= np.where(
+                has_bit, np.left_shift(1, np.maximum(last_positions - position, 0)), 0
+            )
+        order = np.lexsort((reversed_masks, -consequent_lengths, kept_idx))
+        return (
+            kept_idx[order], kept_masks[order], kept_supports[order],
+            confidences[order], lifts[order]
+        )
+    
+    def top_rules(self, config, start=0, stop=None, in_order=False):
+        """
+        Sinh rules của itemsets[start:stop] và giữ top max_rules rules.
+        
+        Args:
+            config: Dictionary chứa cấu hình (như generate_association_rules)
+            start, stop: Đoạn chỉ số itemsets (mặc định toàn bộ)
+            in_order: True: trả về theo thứ tự sinh (như
+                TopRulesHeap.rules_in_order), False: theo quality_score
+                rồi lift giảm dần
+        
+        Returns:
+            List các rules (có quality_score và complexity)
+        """
+        if stop is None:
+            stop = len(self.item_lists)
+        kept = self._kept_rules(config, start, stop)
+        if kept is None:
+            return []
+        kept_idx, kept_masks, kept_supports, confidences, lifts = kept
+        quality_scores = confidences * lifts
+        
+        # Sắp xếp theo quality_score giảm dần, sau đó theo lift (ổn định)
+        order = np.lexsort((-lifts, -quality_scores))
+        order = order[:config.get('max_rules', len(kept_idx))]
+        if in_order:
+            order = np.sort(order)
+        
+        rules = []
+        for pos in order.tolist():
+            idx = int(kept_idx[pos])
+            mask = int(kept_masks[pos])
+            antecedent = frozenset(
+                item for position, item in enumerate(self.item_lists[idx]) if not mask >> position & 1
+            )
+            rules.append({
+                'antecedents': set(antecedent),
+                'consequents': set(self.itemsets[idx] - antecedent),
+                'support': kept_supports[pos].item(),
+                'confidence': confidences[pos].item(),
+                'lift': lifts[pos].item(),
+                'quality_score': quality_scores[pos].item(),
+                'complexity': len(self.item_lists[idx])
+            })
+        return rules
+
+
+def generate_association_rules_batch(frequent_itemsets, total_transactions, config):
+    """
+    Phiên bản vector hóa của generate_association_rules.
+    
+    Mỗi itemset được mã hóa thành một hàng item IDs (_BatchRuleTable); ứng
+    viên của mỗi mức là cặp (chỉ số itemset, bitmask vị trí của
+    consequent). Antecedents / consequents được dựng bằng mask trên các
+    hàng, sắp xếp lại và tra support bằng searchsorted trên bảng itemsets
+    đã sắp xếp; confidence, lift, quality_score và mọi ngưỡng được tính
+    trên mảng. Mức tiếp theo (apriori-gen) cũng được sinh và kiểm tra bằng
+    bitmask. Chỉ các rules cuối cùng (tối đa max_rules) mới được tạo thành
+    dictionary. Kết quả giống hệt generate_association_rules.
+    
+    Args:
+        frequent_itemsets: Dictionary của frequent itemsets và support counts
+        total_transactions: Tổng số transactions
+        config: Dictionary chứa cấu hình (như generate_association_rules)
+    
+    Returns:
+        List các rules đã lọc và sắp xếp theo chất lượng
+    """
+    _, _, table = _prepare_rule_generation(
+        list(frequent_itemsets), list(frequent_itemsets.values()), total_transactions,
+        config, vectorized=True
+    )
+    if table is None:
+        # Không có itemset nào đủ 2 items, itemset quá dài cho bitmask int64,
+        # hoặc cắt tỉa theo mức không chính xác trên bảng support này
+        return generate_association_rules(frequent_itemsets, total_transactions, config)
+    return table.top_rules(config)
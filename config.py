@@ -33,7 +33,18 @@ DISTRICT_CONFIG = {
     'min_confidence': 0.5,       
     'min_lift': 1.2,             
     'min_quality_score': 0.3,    
-    'max_rules': 5000             
+    'max_rules': 5000,
+    'n_jobs': 1,                 # Số process khai phá và sinh rules (1 = tuần tự)
+    'itemset_mode': 'all',       # 'all' hoặc 'closed' (FPClose, ít patterns hơn); 'maximal' không sinh được rules
+    'max_len': None,             # Độ dài itemset tối đa (None = không giới hạn, chỉ với 'all')
+    'engine': 'fptree',          # 'fptree' hoặc 'eclat' (bitset NumPy, hợp với ít items)
+    'compact': False,            # Engine 'fptree' dùng CompactFPTree (mảng, ít bộ nhớ hơn nhiều)
+    'partition_size': None,      # Khai phá SON theo partitions n transactions train đã nạp (None = tắt; không phải out-of-core)
+    'incremental_tree': None,    # File CanTree cập nhật tăng dần theo trip_id (None = build lại từ đầu); khi bật, train/test chia theo hash trip_id
+    'sample_size': None,         # Khai phá xấp xỉ trên mẫu n trips (None = khai phá chính xác); chỉ với engine 'fptree', itemset_mode 'all'
+    'vectorized_rules': True,    # Sinh rules theo lô bằng NumPy (trong từng worker khi n_jobs > 1)
+    'prune_redundant': False,    # Loại rule X -> Y khi có X' ⊂ X, X' -> Y với confidence không thấp hơn (đổi điểm dự đoán)
+    'export_csv': True           # Ghi thêm rules dạng CSV (model chính là file nhị phân .rules)
 }
 
 # Cấu hình cho phân tích Đường (Road)
@@ -42,9 +53,25 @@ ROAD_CONFIG = {
     'min_confidence': 0.7,       
     'min_lift': 1.2,             
     'min_quality_score': 0.4,    
-    'max_rules': 10000            
+    'max_rules': 10000,
+    'n_jobs': os.cpu_count() or 1,  # Khai phá (PFP) và sinh rules song song
+    'itemset_mode': 'all',       # 'all' hoặc 'closed' (FPClose, ít patterns hơn); 'maximal' không sinh được rules
+    'max_len': None,             # Độ dài itemset tối đa (None = không giới hạn, chỉ với 'all')
+    'engine': 'fptree',          # 'fptree' hoặc 'eclat' (bitset NumPy, hợp với ít items)
+    'compact': True,             # Engine 'fptree' dùng CompactFPTree (mảng, ít bộ nhớ hơn nhiều)
+    'partition_size': None,      # Khai phá SON theo partitions n transactions train đã nạp (None = tắt; không phải out-of-core)
+    'incremental_tree': None,    # File CanTree cập nhật tăng dần theo trip_id (None = build lại từ đầu); khi bật, train/test chia theo hash trip_id
+    'sample_size': None,         # Khai phá xấp xỉ trên mẫu n trips (None = khai phá chính xác); chỉ với engine 'fptree', itemset_mode 'all'
+    'vectorized_rules': True,    # Sinh rules theo lô bằng NumPy (trong từng worker khi n_jobs > 1)
+    'prune_redundant': False,    # Loại rule X -> Y khi có X' ⊂ X, X' -> Y với confidence không thấp hơn (đổi điểm dự đoán)
+    'export_csv': True           # Ghi thêm rules dạng CSV (model chính là file nhị phân .rules)
 }
 
+# --- NORMALIZATION CONFIGURATION ---
+# Chuẩn hóa tên quận/đường (bỏ tiền tố) khi main.py đọc dữ liệu train/test.
+# Tắt mặc định để rules khớp với tên gốc trong orders.csv của generate_routes.py
+NORMALIZE_NAMES = False
+
 # --- LOGGING CONFIGURATION ---
 LOG_LEVEL = 'INFO'
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
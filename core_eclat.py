@@ -0,0 +1,135 @@
+"""
+Core Eclat Module
+Engine khai phá frequent itemsets theo chiều dọc (vertical) dùng bitset NumPy.
+Mỗi item được lưu bằng một mảng bit đã nén (1 bit / transaction); support của
+itemset được tính bằng phép AND vector hóa và đếm bit (popcount).
+Phù hợp với dữ liệu dày, ít items (ví dụ ~24 quận trên hàng nghìn trips).
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+# Bảng popcount cho mỗi giá trị byte
+_POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(bit_matrix):
+    """
+    Đếm số bit 1 trên mỗi hàng của ma trận bit đã nén.
+    
+    Args:
+        bit_matrix: np.ndarray uint8 shape (k, n_bytes)
+    
+    Returns:
+        np.ndarray int64 shape (k,)
+    """
+    return _POPCOUNT_TABLE[bit_matrix].sum(axis=1, dtype=np.int64)
+
+
+def build_item_bitsets(transactions, min_support_count):
+    """
+    Xây bitset (đã nén bằng np.packbits) cho các items phổ biến.
+    
+    Args:
+        transactions: Danh sách các transactions (mỗi transaction là một list)
+        min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+    
+    Returns:
+        Tuple (items, bit_matrix, supports) với items sắp xếp theo support
+        tăng dần, bit_matrix là np.ndarray uint8 shape (len(items), n_bytes)
+        và supports là np.ndarray int64
+    """
+    n_transactions = len(transactions)
+    item_tids = defaultdict(list)
+    for tid, transaction in enumerate(transactions):
+        for item in set(transaction):
+            item_tids[item].append(tid)
+    
+    frequent = sorted(
+        [(item, tids) for item, tids in item_tids.items() if len(tids) >= min_support_count],
+        key=lambda x: len(x[1])
+    )
+    
+    n_bytes = (n_transactions + 7) // 8
+    bit_matrix = np.zeros((len(frequent), n_bytes), dtype=np.uint8)
+    row = np.zeros(n_bytes * 8, dtype=bool)
+    for idx, (_, tids) in enumerate(frequent):
+        row[:] = False
+        row[tids] = True
+        bit_matrix[idx] = np.packbits(row)
+    
+    items = [item for item, _ in frequent]
+    supports = np.array([len(tids) for _, tids in frequent], dtype=np.int64)
+    return items, bit_matrix, supports
+
+
+def _mine_eclat(prefix, items, bit_matrix, supports, min_support_count, max_len,
+                frequent_itemsets):
+    """
+    Khai phá đệ quy theo chiều sâu trên các bitset ứng viên.
+    
+    Args:
+        prefix: Prefix hiện tại (list items)
+        items: Items ứng viên mở rộng prefix
+        bit_matrix: Bitset của prefix ∪ {item} cho mỗi ứng viên
+        supports: Support count của prefix ∪ {item}
+        min_support_count: Ngưỡng support tối thiểu
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+        frequent_itemsets: Dictionary kết quả (được cập nhật tại chỗ)
+    """
+    for idx, item in enumerate(items):
+        new_itemset = prefix + [item]
+        frequent_itemsets[frozenset(new_itemset)] = int(supports[idx])
+        
+        if idx + 1 == len(items):
+            continue
+        if max_len is not None and len(new_itemset) >= max_len:
+            continue
+        
+        # AND vector hóa với mọi ứng viên phía sau rồi đếm bit
+        intersections = bit_matrix[idx + 1:] & bit_matrix[idx]
+        counts = popcount_rows(intersections)
+        mask = counts >= min_support_count
+        if not mask.any():
+            continue
+        
+        _mine_eclat(
+            new_itemset,
+            [other for other, keep in zip(items[idx + 1:], mask) if keep],
+            intersections[mask],
+            counts[mask],
+            min_support_count,
+            max_len,
+            frequent_itemsets
+        )
+
+
+def mine_eclat(transactions, min_support_count, max_len=None):
+    """
+    Khai phá frequent itemsets bằng Eclat trên bitset NumPy.
+    
+    Trả về cùng định dạng với core_fptree.mine_fp_tree nên dùng trực tiếp
+    được cho generate_association_rules. Support được tính trên tập items
+    của mỗi transaction (item lặp lại trong một trip chỉ đếm một lần), nên
+    kết quả chỉ giống mine_fp_tree khi transactions không có item lặp lại;
+    với trips ghé lại một vị trí không liền kề, FP-tree đếm item đó nhiều lần.
+    
+    Args:
+        transactions: Danh sách các transactions (mỗi transaction là một list)
+        min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    
+    Returns:
+        Dictionary chứa các frequent itemsets (frozenset) và support counts (int)
+    """
+    frequent_itemsets = {}
+    items, bit_matrix, supports = build_item_bitsets(transactions, min_support_count)
+    
+    if items:
+        _mine_eclat(
+            [], items, bit_matrix, supports, min_support_count, max_len,
+            frequent_itemsets
+        )
+    
+    return frequent_itemsets
@@ -4,7 +4,19 @@ Chứa logic thuật toán FP-Growth thuần túy.
 Module này không phụ thuộc vào bất kỳ module nào khác ngoài thư viện chuẩn.
 """
 
+import heapq
+import math
+import os
+import pickle
+import random
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+
+# Số nút con từ đó một nút của CompactFPTree được tra con bằng dict
+CHILD_INDEX_THRESHOLD = 8
 
 
 class FPNode:
@@ -40,23 +52,30 @@ class FPTree:
     """
     Lớp triển khai FP-Tree (Frequent Pattern Tree).
     """
-    def __init__(self, transactions, min_support_count):
+    def __init__(self, transactions, min_support_count, weighted=False):
         """
         Khởi tạo và xây dựng FP-Tree từ transactions.
         
         Args:
             transactions: Danh sách các transactions (mỗi transaction là một list)
             min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+            weighted: Nếu True, mỗi transaction là một tuple (items, count)
+                thay vì một list items (dùng cho conditional pattern base)
         """
         self.min_support_count = min_support_count
         self.header_table = {}
+        self.header_tail = {}  # Nút cuối của mỗi chain, tránh duyệt lại chain khi chèn
+        self.freq_items = []
         self.root = FPNode(None, 0, None)
         
+        if not weighted:
+            transactions = [(transaction, 1) for transaction in transactions]
+        
         # Scan 1: Tính tần suất của các items
         item_counts = defaultdict(int)
-        for transaction in transactions:
+        for transaction, count in transactions:
             for item in transaction:
-                item_counts[item] += 1
+                item_counts[item] += count
         
         # Lọc các items phổ biến
         frequent_items = {
@@ -78,41 +97,40 @@ class FPTree:
         }
         
         # Scan 2: Xây dựng FP-Tree
-        for transaction in transactions:
+        for transaction, count in transactions:
             # Lọc và sắp xếp transaction theo thứ tự tần suất
             sorted_items = sorted(
                 [item for item in transaction if item in frequent_items],
                 key=lambda x: self.freq_item_order[x]
             )
-            self._insert_transaction(sorted_items)
+            self._insert_transaction(sorted_items, count)
     
-    def _insert_transaction(self, sorted_items):
+    def _insert_transaction(self, sorted_items, count=1):
         """
         Chèn một transaction vào FP-Tree.
         
         Args:
             sorted_items: Transaction đã được sắp xếp theo tần suất
+            count: Trọng số của transaction (số lần lặp lại)
         """
         current_node = self.root
         
         for item in sorted_items:
             if item in current_node.children:
                 # Nút đã tồn tại, tăng count
-                current_node.children[item].increment()
+                current_node.children[item].increment(count)
             else:
                 # Tạo nút mới
-                new_node = FPNode(item, 1, current_node)
+                new_node = FPNode(item, count, current_node)
                 current_node.children[item] = new_node
                 
                 # Cập nhật header table
                 if item not in self.header_table:
                     self.header_table[item] = new_node
                 else:
-                    # Link đến nút cuối cùng trong chain
-                    last_node = self.header_table[item]
-                    while last_node.link_node is not None:
-                        last_node = last_node.link_node
-                    last_node.link_node = new_node
+                    # Link từ nút cuối cùng trong chain
+                    self.header_tail[item].link_node = new_node
+                self.header_tail[item] = new_node
             
             current_node = current_node.children[item]
     
@@ -144,9 +162,592 @@ class FPTree:
             node = node.link_node
         
         return paths
+    
+    def get_single_path(self):
+        """
+        Kiểm tra tree có suy biến thành một path duy nhất hay không.
+        
+        Path có item lặp lại (transaction ghé lại một vị trí không liền kề)
+        không được coi là single path: sinh tổ hợp trực tiếp sẽ cho support
+        khác với khi đệ quy.
+        
+        Returns:
+            List các tuples (item, count) từ root xuống lá nếu tree là
+            single path, ngược lại None
+        """
+        path = []
+        node = self.root
+        
+        while node.children:
+            if len(node.children) > 1:
+                return None
+            node = next(iter(node.children.values()))
+            path.append((node.item, node.count))
+        
+        if len({item for item, _ in path}) != len(path):
+            return None
+        return path
+
+
+class CompactFPTree:
+    """
+    FP-Tree dạng mảng (array-backed) với item ID là số nguyên liên tục.
+    
+    Mỗi nút được lưu bằng chỉ số trong các mảng song song (item, count,
+    parent, node-link, first-child, next-sibling) thay vì một object FPNode
+    có dict children riêng. Nút 0 là root. Item ID được gán theo thứ tự tần
+    suất giảm dần nên sắp xếp transaction chỉ cần so sánh số nguyên.
+    Chỉ các nút có từ CHILD_INDEX_THRESHOLD con trở lên (và root) mới có
+    dict item ID -> nút con; các nút còn lại tìm con bằng danh sách anh em.
+    Có cùng giao diện với FPTree (freq_items, get_paths) để dùng trong
+    mine_fp_tree.
+    """
+    def __init__(self, transactions, min_support_count, weighted=False):
+        """
+        Khởi tạo và xây dựng Compact FP-Tree từ transactions.
+        
+        Args:
+            transactions: Danh sách các transactions (mỗi transaction là một list)
+            min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+            weighted: Nếu True, mỗi transaction là một tuple (items, count)
+        """
+        self.min_support_count = min_support_count
+        self.freq_items = []
+        self.item_ids = {}
+        self.id_items = []
+        
+        # Các mảng song song của nút, phần tử 0 là root
+        self.node_item = array('i', [-1])
+        self.node_count = array('q', [0])
+        self.node_parent = array('i', [-1])
+        self.node_link = array('i', [-1])
+        self.node_first_child = array('i', [-1])
+        self.node_next_sibling = array('i', [-1])
+        self.node_n_children = array('i', [0])
+        # Nút có nhiều con (luôn gồm root) có thêm dict item ID -> nút con
+        # để không phải duyệt danh sách anh em; các nút khác chỉ tốn mảng
+        self._child_index = {0: {}}
+        
+        if not weighted:
+            transactions = [(transaction, 1) for transaction in transactions]
+        
+        # Scan 1: Tính tần suất của các items
+        item_counts = defaultdict(int)
+        for transaction, count in transactions:
+            for item in transaction:
+                item_counts[item] += count
+        
+        self.freq_items = sorted(
+            [(item, count) for item, count in item_counts.items()
+             if count >= min_support_count],
+            key=lambda x: x[1],
+            reverse=True
+        )
+        if not self.freq_items:
+            return
+        
+        # Mã hóa items thành ID liên tục theo thứ tự tần suất
+        for item_id, (item, _) in enumerate(self.freq_items):
+            self.item_ids[item] = item_id
+            self.id_items.append(item)
+        self.header_head = array('i', [-1]) * len(self.id_items)
+        self.header_tail = array('i', [-1]) * len(self.id_items)
+        
+        # Scan 2: Xây dựng tree
+        item_ids = self.item_ids
+        for transaction, count in transactions:
+            sorted_ids = sorted(
+                item_ids[item] for item in transaction if item in item_ids
+            )
+            self._insert_transaction(sorted_ids, count)
+    
+    def __len__(self):
+        """Số nút trong tree (không tính root)."""
+        return len(self.node_item) - 1
+    
+    def _find_child(self, node, item_id):
+        """
+        Tìm nút con của node mang item_id.
+        
+        Returns:
+            Chỉ số nút con, hoặc -1 nếu không tồn tại
+        """
+        children = self._child_index.get(node)
+        if children is not None:
+            return children.get(item_id, -1)
+        child = self.node_first_child[node]
+        while child != -1 and self.node_item[child] != item_id:
+            child = self.node_next_sibling[child]
+        return child
+    
+    def _insert_transaction(self, sorted_ids, count=1):
+        """
+        Chèn một transaction (đã mã hóa và sắp xếp) vào tree.
+        
+        Args:
+            sorted_ids: List item ID tăng dần
+            count: Trọng số của transaction
+        """
+        node = 0
+        for item_id in sorted_ids:
+            child = self._find_child(node, item_id)
+            if child != -1:
+                self.node_count[child] += count
+            else:
+                child = len(self.node_item)
+                self.node_item.append(item_id)
+                self.node_count.append(count)
+                self.node_parent.append(node)
+                self.node_link.append(-1)
+                self.node_first_child.append(-1)
+                self.node_next_sibling.append(self.node_first_child[node])
+                self.node_n_children.append(0)
+                self.node_first_child[node] = child
+                self._add_child_index(node, item_id, child)
+                
+                # Cập nhật node-link qua tail pointer
+                tail = self.header_tail[item_id]
+                if tail == -1:
+                    self.header_head[item_id] = child
+                else:
+                    self.node_link[tail] = child
+                self.header_tail[item_id] = child
+            node = child
+    
+    def _add_child_index(self, node, item_id, child):
+        """Ghi nhận nút con mới của node, dựng dict con khi node đạt CHILD_INDEX_THRESHOLD con."""
+        n_children = self.node_n_children[node] + 1
+        self.node_n_children[node] = n_children
+        
+        children = self._child_index.get(node)
+        if children is not None:
+            children[item_id] = child
+        elif n_children >= CHILD_INDEX_THRESHOLD:
+            children = self._child_index[node] = {}
+            sibling = self.node_first_child[node]
+            while sibling != -1:
+                children[self.node_item[sibling]] = sibling
+                sibling = self.node_next_sibling[sibling]
+    
+    def get_paths(self, item):
+        """
+        Lấy tất cả các paths kết thúc tại item.
+        
+        Args:
+            item: Item cần lấy paths
+        
+        Returns:
+            List các tuples (path, count) với path là list các items
+        """
+        paths = []
+        item_id = self.item_ids.get(item)
+        if item_id is None:
+            return paths
+        
+        node_item = self.node_item
+        node_parent = self.node_parent
+        id_items = self.id_items
+        
+        node = self.header_head[item_id]
+        while node != -1:
+            path = []
+            parent = node_parent[node]
+            while parent != 0:
+                path.append(id_items[node_item[parent]])
+                parent = node_parent[parent]
+            
+            if path:
+                paths.append((path[::-1], self.node_count[node]))
+            
+            node = self.node_link[node]
+        
+        return paths
+    
+    def get_single_path(self):
+        """
+        Kiểm tra tree có suy biến thành một path duy nhất hay không.
+        
+        Path có item lặp lại (transaction ghé lại một vị trí không liền kề)
+        không được coi là single path: sinh tổ hợp trực tiếp sẽ cho support
+        khác với khi đệ quy.
+        
+        Returns:
+            List các tuples (item, count) từ root xuống lá nếu tree là
+            single path, ngược lại None
+        """
+        path = []
+        node = self.node_first_child[0]
+        
+        while node != -1:
+            if self.node_next_sibling[node] != -1:
+                return None
+            path.append((self.id_items[self.node_item[node]], self.node_count[node]))
+            node = self.node_first_child[node]
+        
+        if len({item for item, _ in path}) != len(path):
+            return None
+        return path
+
+
+class CanTree(CompactFPTree):
+    """
+    Canonical-order tree (CanTree) cập nhật được theo từng đợt transactions.
+    
+    Khác FP-Tree, items được sắp theo một thứ tự cố định (thứ tự xuất hiện
+    lần đầu, cũng là item ID) thay vì theo tần suất, và không lọc theo
+    min support khi chèn. Vì vậy transactions mới được chèn thẳng vào tree
+    mà không cần sắp xếp lại hay quét lại dữ liệu cũ; ngưỡng support chỉ
+    được áp dụng khi khai phá. Lưu trữ dạng mảng như CompactFPTree nên
+    pickle nhanh và gọn.
+    """
+    def __init__(self, metadata=None):
+        """
+        Khởi tạo CanTree rỗng.
+        
+        Args:
+            metadata: Dictionary mô tả cách tạo transactions (cột, chuẩn hóa
+                tên, cách chia train/test...), được lưu cùng tree để kiểm
+                tra khi nạp lại
+        """
+        super().__init__([], 1)
+        self.metadata = dict(metadata or {})
+        self.item_counts = array('q')
+        self.header_head = array('i')
+        self.header_tail = array('i')
+        self.seen_keys = set()
+        self.n_transactions = 0
+    
+    def _item_id(self, item):
+        """Lấy (hoặc cấp mới) ID canonical của item."""
+        item_id = self.item_ids.get(item)
+        if item_id is None:
+            item_id = len(self.id_items)
+            self.item_ids[item] = item_id
+            self.id_items.append(item)
+            self.item_counts.append(0)
+            self.header_head.append(-1)
+            self.header_tail.append(-1)
+        return item_id
+    
+    def add_transactions(self, transactions, keys=None):
+        """
+        Chèn thêm transactions vào tree.
+        
+        Args:
+            transactions: Danh sách các transactions (mỗi transaction là một list)
+            keys: Danh sách khóa (ví dụ trip_id) song song với transactions;
+                transactions có khóa đã chèn trước đó sẽ bị bỏ qua
+        
+        Returns:
+            Số transactions thực sự được chèn
+        """
+        if keys is None:
+            keys = [None] * len(transactions)
+        
+        added = 0
+        for key, transaction in zip(keys, transactions):
+            if key is not None:
+                if key in self.seen_keys:
+                    continue
+                self.seen_keys.add(key)
+            
+            sorted_ids = sorted({self._item_id(item) for item in transaction})
+            for item_id in sorted_ids:
+                self.item_counts[item_id] += 1
+            self._insert_transaction(sorted_ids)
+            self.n_transactions += 1
+            added += 1
+        
+        return added
+    
+    def get_single_path(self):
+        """CanTree không lọc items theo support nên không dùng shortcut này."""
+        return None
+    
+    def mine(self, min_support_count, max_len=None):
+        """
+        Khai phá frequent itemsets từ trạng thái hiện tại của tree.
+        
+        Conditional pattern base của một item chỉ gồm các items đứng trước
+        nó theo thứ tự canonical, nên mỗi itemset được tìm đúng một lần qua
+        item đứng sau cùng của nó.
+        
+        Args:
+            min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+            max_len: Độ dài itemset tối đa (None = không giới hạn)
+        
+        Returns:
+            Dictionary chứa các frequent itemsets (frozenset) và support counts (int)
+        """
+        frequent_itemsets = {}
+        
+        for item_id, support_count in enumerate(self.item_counts):
+            if support_count < min_support_count:
+                continue
+            item = self.id_items[item_id]
+            frequent_itemsets[frozenset([item])] = support_count
+            
+            if max_len is not None and max_len <= 1:
+                continue
+            conditional_patterns = self.get_paths(item)
+            if conditional_patterns:
+                frequent_itemsets.update(mine_fp_tree(
+                    conditional_patterns,
+                    min_support_count,
+                    [item],
+                    weighted=True,
+                    max_len=max_len
+                ))
+        
+        return frequent_itemsets
+    
+    def save(self, filepath):
+        """
+        Lưu tree ra file (pickle).
+        
+        Args:
+            filepath: Đường dẫn file đầu ra
+        """
+        with open(filepath, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @classmethod
+    def load(cls, filepath):
+        """
+        Đọc tree đã lưu bằng save().
+        
+        Args:
+            filepath: Đường dẫn file
+        
+        Returns:
+            CanTree
+        """
+        with open(filepath, 'rb') as file:
+            return pickle.load(file)
 
 
-def mine_fp_tree(transactions, min_support_count, prefix=None):
+def encode_transactions(transactions, weighted=False):
+    """
+    Mã hóa items thành số nguyên liên tục (một lần cho toàn bộ dữ liệu).
+    
+    Args:
+        transactions: Danh sách các transactions
+        weighted: Nếu True, transactions là các tuple (items, count)
+    
+    Returns:
+        Tuple (vocabulary, encoded) với vocabulary[id] là item gốc và
+        encoded có cùng dạng với transactions nhưng chứa item ID
+    """
+    item_ids = {}
+    vocabulary = []
+    
+    def encode(items):
+        encoded_items = []
+        for item in items:
+            item_id = item_ids.get(item)
+            if item_id is None:
+                item_id = len(vocabulary)
+                item_ids[item] = item_id
+                vocabulary.append(item)
+            encoded_items.append(item_id)
+        return encoded_items
+    
+    if weighted:
+        encoded = [(encode(items), count) for items, count in transactions]
+    else:
+        encoded = [encode(transaction) for transaction in transactions]
+    
+    return vocabulary, encoded
+
+
+MINING_MODES = ('all', 'closed', 'maximal')
+
+
+class SupersetIndex:
+    """
+    Chỉ mục các itemsets đã tìm được để kiểm tra superset nhanh
+    (thay cho CFI-tree / MFI-tree trong FPClose / FPMax).
+    
+    Mỗi item ánh xạ tới tập các chỉ số itemset chứa nó; superset của X
+    là giao của các tập đó.
+    """
+    def __init__(self):
+        self.itemsets = []
+        self.supports = []
+        self.item_index = defaultdict(set)
+    
+    def add(self, itemset, support):
+        """
+        Thêm một itemset vào chỉ mục.
+        
+        Args:
+            itemset: Iterable các items
+            support: Support count của itemset
+        """
+        idx = len(self.itemsets)
+        itemset = frozenset(itemset)
+        self.itemsets.append(itemset)
+        self.supports.append(support)
+        for item in itemset:
+            self.item_index[item].add(idx)
+    
+    def has_superset(self, itemset, support=None):
+        """
+        Kiểm tra có itemset nào đã lưu chứa itemset hay không.
+        
+        Args:
+            itemset: Iterable các items (khác rỗng)
+            support: Nếu khác None, chỉ xét các superset có cùng support
+        
+        Returns:
+            True nếu tồn tại superset thỏa điều kiện
+        """
+        postings = []
+        for item in itemset:
+            posting = self.item_index.get(item)
+            if not posting:
+                return False
+            postings.append(posting)
+        
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if support is None:
+            return bool(candidates)
+        return any(self.supports[idx] == support for idx in candidates)
+
+
+def _mine_condensed(transactions, min_support_count, prefix, weighted, compact,
+                    mode, index, frequent_itemsets):
+    """
+    Khai phá closed (FPClose) hoặc maximal (FPMax) itemsets.
+    
+    Items được duyệt từ ít phổ biến đến phổ biến nhất nên mọi superset
+    cần so sánh của một ứng viên đều đã nằm trong index khi ứng viên đó
+    được kiểm tra.
+    - closed: gộp vào prefix các items xuất hiện trong mọi transaction
+      của conditional pattern base (cùng support), cắt nhánh nếu đã có
+      superset cùng support.
+    - maximal: cắt nhánh nếu prefix ∪ tail đã nằm trong một maximal
+      itemset; chỉ lưu ứng viên khi conditional tree rỗng.
+    
+    Args:
+        transactions: Transactions (hoặc conditional pattern base)
+        min_support_count: Ngưỡng support tối thiểu
+        prefix: Prefix hiện tại
+        weighted: Transactions có dạng (items, count) hay không
+        compact: Dùng CompactFPTree hay không
+        mode: 'closed' hoặc 'maximal'
+        index: SupersetIndex chung cho toàn bộ quá trình khai phá
+        frequent_itemsets: Dictionary kết quả (được cập nhật tại chỗ)
+    """
+    tree_class = CompactFPTree if compact else FPTree
+    tree = tree_class(transactions, min_support_count, weighted=weighted)
+    
+    if not tree.freq_items:
+        return
+    
+    single_path = tree.get_single_path()
+    if single_path is not None:
+        path_items = [item for item, _ in single_path]
+        if mode == 'maximal':
+            # Ứng viên maximal duy nhất là toàn bộ path
+            candidates = [(prefix + path_items, single_path[-1][1])]
+        else:
+            # Mỗi nút cuối của một đoạn cùng count cho một closed itemset
+            candidates = [
+                (prefix + path_items[:depth + 1], count)
+                for depth, (_, count) in enumerate(single_path)
+                if depth + 1 == len(single_path) or single_path[depth + 1][1] != count
+            ]
+        
+        for candidate, support_count in candidates:
+            check_support = support_count if mode == 'closed' else None
+            if not index.has_superset(candidate, check_support):
+                index.add(candidate, support_count)
+                frequent_itemsets[frozenset(candidate)] = support_count
+        return
+    
+    for item, support_count in reversed(tree.freq_items):
+        new_itemset = prefix + [item]
+        conditional_patterns = tree.get_paths(item)
+        
+        # Đếm items trong conditional pattern base để biết tail
+        item_counts = defaultdict(int)
+        for path, count in conditional_patterns:
+            for path_item in path:
+                item_counts[path_item] += count
+        tail = [
+            path_item for path_item, count in item_counts.items()
+            if count >= min_support_count
+        ]
+        
+        if mode == 'closed':
+            # Item merging: items có cùng support thuộc closure của new_itemset
+            merged = {
+                path_item for path_item in tail
+                if item_counts[path_item] == support_count
+            }
+            if merged:
+                new_itemset += [path_item for path_item in tail if path_item in merged]
+                tail = [path_item for path_item in tail if path_item not in merged]
+                conditional_patterns = [
+                    ([path_item for path_item in path if path_item not in merged], count)
+                    for path, count in conditional_patterns
+                ]
+            
+            if index.has_superset(new_itemset, support_count):
+                continue
+            index.add(new_itemset, support_count)
+            frequent_itemsets[frozenset(new_itemset)] = support_count
+        else:
+            if index.has_superset(new_itemset + tail):
+                continue
+            if not tail:
+                index.add(new_itemset, support_count)
+                frequent_itemsets[frozenset(new_itemset)] = support_count
+                continue
+        
+        if tail:
+            _mine_condensed(
+                conditional_patterns,
+                min_support_count,
+                new_itemset,
+                True,
+                compact,
+                mode,
+                index,
+                frequent_itemsets
+            )
+
+
+def _mine_single_path(path, prefix, frequent_itemsets, cap=None, max_len=None):
+    """
+    Sinh trực tiếp mọi tổ hợp của một single path mà không xây thêm
+    conditional tree. Support của một tổ hợp là count của item sâu nhất
+    trong path (count giảm dần từ root xuống lá).
+    
+    Thứ tự sinh giống hệt khi đệ quy qua conditional trees.
+    
+    Args:
+        path: List các tuples (item, count) từ root xuống lá
+        prefix: Prefix hiện tại
+        frequent_itemsets: Dictionary kết quả (được cập nhật tại chỗ)
+        cap: Support của prefix trong path (None ở mức đầu)
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    """
+    for depth in range(len(path) - 1, -1, -1):
+        item, count = path[depth]
+        if cap is not None:
+            count = min(count, cap)
+        
+        new_itemset = prefix + [item]
+        frequent_itemsets[frozenset(new_itemset)] = count
+        if max_len is None or len(new_itemset) < max_len:
+            _mine_single_path(path[:depth], new_itemset, frequent_itemsets, count, max_len)
+
+
+def mine_fp_tree(transactions, min_support_count, prefix=None, weighted=False,
+                 compact=False, mode='all', max_len=None):
     """
     Khai phá FP-Tree để tìm các frequent itemsets.
     Sử dụng thuật toán FP-Growth với đệ quy.
@@ -155,51 +756,613 @@ def mine_fp_tree(transactions, min_support_count, prefix=None):
         transactions: Danh sách các transactions
         min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
         prefix: Prefix hiện tại (cho đệ quy)
+        weighted: Nếu True, transactions là các tuple (items, count)
+        compact: Nếu True, mã hóa items thành số nguyên một lần và dùng
+            CompactFPTree (tiết kiệm bộ nhớ cho dữ liệu lớn)
+        mode: 'all' (mọi frequent itemsets), 'closed' (không có superset
+            cùng support) hoặc 'maximal' (không có superset phổ biến).
+            Support của mọi frequent itemset suy ra được từ closed itemsets
+            nên 'closed' dùng được cho generate_association_rules;
+            'maximal' chỉ dùng để tóm tắt patterns.
+        max_len: Độ dài itemset tối đa; dừng đệ quy khi prefix đạt độ dài
+            này nên các nhánh sâu hơn không bao giờ được xây dựng
+            (None = không giới hạn, chỉ hỗ trợ mode='all')
     
     Returns:
         Dictionary chứa các frequent itemsets (frozenset) và support counts (int)
     """
+    if mode not in MINING_MODES:
+        raise ValueError(f"mode phải là một trong {MINING_MODES}, nhận được '{mode}'")
+    if max_len is not None and mode != 'all':
+        raise ValueError("max_len chỉ hỗ trợ mode='all'")
+    
+    if compact and prefix is None:
+        # Mã hóa một lần ở lần gọi đầu tiên, giải mã kết quả khi trả về
+        vocabulary, encoded = encode_transactions(transactions, weighted)
+        encoded_itemsets = mine_fp_tree(
+            encoded, min_support_count, [], weighted, compact=True, mode=mode,
+            max_len=max_len
+        )
+        return {
+            frozenset(vocabulary[item_id] for item_id in itemset): count
+            for itemset, count in encoded_itemsets.items()
+        }
+    
     if prefix is None:
         prefix = []
     
     frequent_itemsets = {}
     
+    if mode != 'all':
+        _mine_condensed(
+            transactions, min_support_count, prefix, weighted, compact,
+            mode, SupersetIndex(), frequent_itemsets
+        )
+        return frequent_itemsets
+    
     # Xây dựng FP-Tree
-    tree = FPTree(transactions, min_support_count)
+    tree_class = CompactFPTree if compact else FPTree
+    tree = tree_class(transactions, min_support_count, weighted=weighted)
     
-    if not tree.header_table:
+    if not tree.freq_items:
         return frequent_itemsets
     
-    # Duyệt các items từ ít phổ biến đến phổ biến nhất
-    items = [item for item, _ in reversed(tree.freq_items)]
+    # Tree chỉ có một path: sinh tổ hợp trực tiếp, không cần đệ quy
+    single_path = tree.get_single_path()
+    if single_path is not None:
+        _mine_single_path(single_path, prefix, frequent_itemsets, max_len=max_len)
+        return frequent_itemsets
     
-    for item in items:
+    # Duyệt các items từ ít phổ biến đến phổ biến nhất
+    # (count ở scan 1 chính là tổng count trên node-link chain của item)
+    for item, support_count in reversed(tree.freq_items):
         # Tạo frequent itemset mới
         new_itemset = prefix + [item]
         
-        # Tính support count
-        support_count = 0
-        node = tree.header_table.get(item)
-        while node is not None:
-            support_count += node.count
-            node = node.link_node
-        
         # Lưu frequent itemset
         frequent_itemsets[frozenset(new_itemset)] = support_count
         
-        # Tạo conditional pattern base
+        # Đã đạt độ dài tối đa: không xây conditional tree
+        if max_len is not None and len(new_itemset) >= max_len:
+            continue
+        
+        # Tạo conditional pattern base (mỗi path giữ nguyên count làm trọng số)
         conditional_patterns = tree.get_paths(item)
-        conditional_transactions = []
-        for path, count in conditional_patterns:
-            conditional_transactions.extend([path] * count)
         
         # Đệ quy khai phá conditional FP-tree
-        if conditional_transactions:
+        if conditional_patterns:
             conditional_itemsets = mine_fp_tree(
-                conditional_transactions, 
+                conditional_patterns, 
                 min_support_count, 
-                new_itemset
+                new_itemset,
+                weighted=True,
+                compact=compact,
+                max_len=max_len
             )
             frequent_itemsets.update(conditional_itemsets)
     
     return frequent_itemsets
+
+
+def _iter_single_path(path, prefix, max_len=None):
+    """
+    Phiên bản không đệ quy của _mine_single_path (cùng thứ tự sinh).
+    
+    Args:
+        path: List các tuples (item, count) từ root xuống lá
+        prefix: Buffer prefix dùng chung (được khôi phục khi kết thúc)
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    
+    Yields:
+        Tuple (prefix, support) với prefix là buffer dùng chung; caller
+        phải sao chép trước khi lưu
+    """
+    # Mỗi frame: [độ sâu tiếp theo cần xét, support của prefix]
+    stack = [[len(path) - 1, None]]
+    
+    while stack:
+        frame = stack[-1]
+        depth, cap = frame
+        if depth < 0:
+            stack.pop()
+            if stack:
+                prefix.pop()
+            continue
+        frame[0] -= 1
+        
+        item, count = path[depth]
+        if cap is not None:
+            count = min(count, cap)
+        
+        prefix.append(item)
+        yield prefix, count
+        
+        if depth > 0 and (max_len is None or len(prefix) < max_len):
+            stack.append([depth - 1, count])
+        else:
+            prefix.pop()
+
+
+def iter_fp_tree(transactions, min_support_count, weighted=False, compact=False,
+                 max_len=None):
+    """
+    Khai phá FP-Growth không đệ quy, trả về itemsets dạng generator.
+    
+    Dùng stack tường minh thay cho đệ quy nên không bị giới hạn độ sâu
+    đệ quy của Python; prefix là một buffer duy nhất được append/pop
+    thay vì tạo list mới ở mỗi mức. Mỗi conditional tree chỉ được xây
+    khi đi xuống và được giải phóng ngay khi duyệt xong. Thứ tự sinh
+    giống hệt mine_fp_tree(mode='all').
+    
+    Args:
+        transactions: Danh sách các transactions
+        min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+        weighted: Nếu True, transactions là các tuple (items, count)
+        compact: Nếu True, mã hóa items thành số nguyên và dùng CompactFPTree
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    
+    Yields:
+        Tuple (itemset, support_count) với itemset là frozenset
+    """
+    vocabulary = None
+    if compact:
+        vocabulary, transactions = encode_transactions(transactions, weighted)
+    tree_class = CompactFPTree if compact else FPTree
+    
+    def emit(prefix):
+        if vocabulary is None:
+            return frozenset(prefix)
+        return frozenset(vocabulary[item_id] for item_id in prefix)
+    
+    prefix = []
+    stack = []  # Mỗi frame: [tree, chỉ số item tiếp theo trong freq_items]
+    
+    tree = tree_class(transactions, min_support_count, weighted=weighted)
+    del transactions
+    if not tree.freq_items:
+        return
+    single_path = tree.get_single_path()
+    if single_path is not None:
+        for itemset, support_count in _iter_single_path(single_path, prefix, max_len):
+            yield emit(itemset), support_count
+        return
+    stack.append([tree, len(tree.freq_items) - 1])
+    del tree
+    
+    while stack:
+        frame = stack[-1]
+        tree, idx = frame
+        if idx < 0:
+            # Duyệt xong conditional tree này, quay lại mức trên
+            stack.pop()
+            if stack:
+                prefix.pop()
+            continue
+        frame[1] -= 1
+        
+        # Duyệt các items từ ít phổ biến đến phổ biến nhất
+        item, support_count = tree.freq_items[idx]
+        prefix.append(item)
+        yield emit(prefix), support_count
+        
+        descended = False
+        if max_len is None or len(prefix) < max_len:
+            conditional_patterns = tree.get_paths(item)
+            if conditional_patterns:
+                child = tree_class(conditional_patterns, min_support_count, weighted=True)
+                del conditional_patterns
+                if child.freq_items:
+                    single_path = child.get_single_path()
+                    if single_path is not None:
+                        for itemset, count in _iter_single_path(single_path, prefix, max_len):
+                            yield emit(itemset), count
+                    else:
+                        stack.append([child, len(child.freq_items) - 1])
+                        descended = True
+        
+        if not descended:
+            prefix.pop()
+
+
+def _mine_conditional_group(group, min_support_count, compact, max_len=None):
+    """
+    Worker: khai phá các conditional pattern bases của một nhóm items.
+    
+    Args:
+        group: List các tuple (item, conditional_patterns)
+        min_support_count: Ngưỡng support tối thiểu
+        compact: Dùng CompactFPTree hay không
+        max_len: Độ dài itemset tối đa
+    
+    Returns:
+        List các tuple (item, frequent_itemsets) theo thứ tự của group
+    """
+    results = []
+    for item, conditional_patterns in group:
+        itemsets = {}
+        if conditional_patterns:
+            itemsets = mine_fp_tree(
+                conditional_patterns,
+                min_support_count,
+                [item],
+                weighted=True,
+                compact=compact,
+                max_len=max_len
+            )
+        results.append((item, itemsets))
+    return results
+
+
+def _balance_groups(tasks, n_groups):
+    """
+    Chia tasks thành n_groups nhóm có tổng chi phí gần bằng nhau (LPT).
+    Chi phí của một item ước lượng bằng tổng độ dài các paths trong
+    conditional pattern base của nó.
+    
+    Args:
+        tasks: List các tuple (item, conditional_patterns)
+        n_groups: Số nhóm cần chia
+    
+    Returns:
+        List các nhóm (bỏ qua nhóm rỗng)
+    """
+    groups = [[] for _ in range(n_groups)]
+    loads = [(0, idx) for idx in range(n_groups)]
+    
+    by_cost = sorted(
+        tasks,
+        key=lambda task: sum(len(path) for path, _ in task[1]),
+        reverse=True
+    )
+    for task in by_cost:
+        load, idx = heapq.heappop(loads)
+        groups[idx].append(task)
+        cost = sum(len(path) for path, _ in task[1])
+        heapq.heappush(loads, (load + cost, idx))
+    
+    return [group for group in groups if group]
+
+
+def mine_fp_tree_parallel(transactions, min_support_count, n_workers=None,
+                          compact=False, max_len=None):
+    """
+    Khai phá FP-Growth song song theo tiến trình (PFP-style).
+    
+    Xây dựng FP-Tree toàn cục một lần, tách conditional pattern base của
+    từng item ở mức đầu, chia các items thành nhóm cân bằng tải và khai
+    phá mỗi nhóm trên một process. Kết quả giống hệt mine_fp_tree (kể cả
+    thứ tự các itemsets trong dictionary).
+    
+    Args:
+        transactions: Danh sách các transactions
+        min_support_count: Ngưỡng support tối thiểu (số lần xuất hiện)
+        n_workers: Số process (mặc định: số CPU)
+        compact: Nếu True, mã hóa items thành số nguyên và dùng CompactFPTree
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    
+    Returns:
+        Dictionary chứa các frequent itemsets (frozenset) và support counts (int)
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    
+    vocabulary = None
+    if compact:
+        vocabulary, transactions = encode_transactions(transactions)
+    
+    tree_class = CompactFPTree if compact else FPTree
+    tree = tree_class(transactions, min_support_count)
+    
+    # Thứ tự giống mine_fp_tree: từ ít phổ biến đến phổ biến nhất
+    items = list(reversed(tree.freq_items))
+    if max_len is not None and max_len <= 1:
+        tasks = [(item, []) for item, _ in items]
+    else:
+        tasks = [(item, tree.get_paths(item)) for item, _ in items]
+    del tree
+    
+    results = {}
+    if n_workers <= 1 or len(tasks) <= 1:
+        for item, itemsets in _mine_conditional_group(
+            tasks, min_support_count, compact, max_len
+        ):
+            results[item] = itemsets
+    else:
+        groups = _balance_groups(tasks, n_workers)
+        with ProcessPoolExecutor(max_workers=len(groups)) as executor:
+            for group_results in executor.map(
+                _mine_conditional_group,
+                groups,
+                repeat(min_support_count),
+                repeat(compact),
+                repeat(max_len)
+            ):
+                for item, itemsets in group_results:
+                    results[item] = itemsets
+    
+    # Gộp kết quả theo đúng thứ tự của bản tuần tự
+    frequent_itemsets = {}
+    for item, support_count in items:
+        frequent_itemsets[frozenset([item])] = support_count
+        frequent_itemsets.update(results[item])
+    
+    if compact:
+        return {
+            frozenset(vocabulary[item_id] for item_id in itemset): count
+            for itemset, count in frequent_itemsets.items()
+        }
+    return frequent_itemsets
+
+
+def _mine_partition(transactions, min_support, max_len):
+    """
+    Worker SON pha 1: khai phá frequent itemsets cục bộ của một partition.
+    
+    Ngưỡng cục bộ là floor(min_support * len(partition)) (tối thiểu 1) nên
+    mọi itemset phổ biến toàn cục đều phổ biến ở ít nhất một partition.
+    
+    Returns:
+        Tuple (số transactions, list các itemsets cục bộ)
+    """
+    local_support_count = max(1, int(len(transactions) * min_support))
+    itemsets = mine_fp_tree(transactions, local_support_count, max_len=max_len)
+    return len(transactions), list(itemsets)
+
+
+def build_candidate_trie(candidates):
+    """
+    Xây prefix trie cho các itemsets ứng viên để đếm support trong một lượt.
+    
+    Items trong mỗi ứng viên được sắp theo một thứ tự toàn cục; vì tập ứng
+    viên đóng dưới phép lấy tập con nên mọi nút của trie là một ứng viên.
+    
+    Args:
+        candidates: Iterable các frozensets
+    
+    Returns:
+        Tuple (trie, item_rank) với trie là dict lồng nhau
+        {item: [count, children]} và item_rank là thứ tự toàn cục của items
+    """
+    candidates = list(candidates)
+    item_rank = {}
+    for itemset in candidates:
+        for item in itemset:
+            if item not in item_rank:
+                item_rank[item] = len(item_rank)
+    
+    trie = {}
+    for itemset in candidates:
+        node = trie
+        for item in sorted(itemset, key=item_rank.__getitem__):
+            entry = node.get(item)
+            if entry is None:
+                entry = node[item] = [0, {}]
+            node = entry[1]
+    
+    return trie, item_rank
+
+
+def count_candidates(transactions, trie, item_rank):
+    """
+    Cộng support của các ứng viên trong trie trên một nhóm transactions.
+    
+    Args:
+        transactions: Danh sách các transactions
+        trie: Prefix trie từ build_candidate_trie (count được cộng tại chỗ)
+        item_rank: Thứ tự toàn cục của items
+    """
+    for transaction in transactions:
+        items = sorted(
+            {item for item in transaction if item in item_rank},
+            key=item_rank.__getitem__
+        )
+        # Stack các cặp (nút trie, vị trí bắt đầu trong items)
+        stack = [(trie, 0)]
+        while stack:
+            node, start = stack.pop()
+            for pos in range(start, len(items)):
+                entry = node.get(items[pos])
+                if entry is not None:
+                    entry[0] += 1
+                    if entry[1]:
+                        stack.append((entry[1], pos + 1))
+
+
+def _trie_counts(trie, prefix=()):
+    """Duyệt trie, trả về các cặp (itemset, count)."""
+    stack = [(trie, prefix)]
+    while stack:
+        node, prefix = stack.pop()
+        for item, (count, children) in node.items():
+            itemset = prefix + (item,)
+            yield itemset, count
+            if children:
+                stack.append((children, itemset))
+
+
+def _iter_trie_entries(trie):
+    """Duyệt mọi entry [count, children] của trie."""
+    stack = [trie]
+    while stack:
+        node = stack.pop()
+        for entry in node.values():
+            yield entry
+            if entry[1]:
+                stack.append(entry[1])
+
+
+_worker_trie = None
+
+
+def _init_count_worker(trie, item_rank):
+    """Initializer cho worker đếm: nhận trie ứng viên một lần."""
+    global _worker_trie
+    _worker_trie = (trie, item_rank)
+
+
+def _count_partition(transactions):
+    """
+    Worker SON pha 2: đếm support các ứng viên trên một partition.
+    
+    Returns:
+        Dictionary {itemset tuple: count} cho các ứng viên có count > 0
+    """
+    trie, item_rank = _worker_trie
+    # Reset count (trie của worker được dùng lại giữa các partitions)
+    for itemset_node in _iter_trie_entries(trie):
+        itemset_node[0] = 0
+    count_candidates(transactions, trie, item_rank)
+    return {itemset: count for itemset, count in _trie_counts(trie) if count}
+
+
+def _map_bounded(executor, func, iterable, max_pending):
+    """
+    Giống executor.map nhưng chỉ giữ tối đa max_pending tasks đang chạy,
+    để không phải nạp toàn bộ partitions vào bộ nhớ cùng lúc.
+    """
+    pending = []
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def mine_partitioned(partition_source, min_support, n_workers=1, max_len=None):
+    """
+    Khai phá frequent itemsets theo partitions (thuật toán SON).
+    
+    Pha 1 khai phá từng partition (vừa bộ nhớ) với ngưỡng tỉ lệ tương ứng
+    và hợp các itemsets cục bộ thành tập ứng viên. Pha 2 đếm support toàn
+    cục của các ứng viên trong một lượt duyệt nữa. Tại mọi thời điểm chỉ
+    cần giữ một partition (hoặc n_workers partitions) trong bộ nhớ.
+    
+    Args:
+        partition_source: Hàm không tham số trả về một iterator mới các
+            partitions (mỗi partition là một list transactions), ví dụ
+            lambda: data_handler.iter_transaction_chunks(path, 'road_name', 50000)
+        min_support: Ngưỡng support tối thiểu dạng tỉ lệ (0-1)
+        n_workers: Số process khai phá/đếm song song các partitions
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+    
+    Returns:
+        Dictionary chứa các frequent itemsets (frozenset) và support counts (int)
+    """
+    # Pha 1: Ứng viên = hợp các frequent itemsets cục bộ
+    candidates = set()
+    total_transactions = 0
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = _map_bounded(
+                executor,
+                partial(_mine_partition, min_support=min_support, max_len=max_len),
+                partition_source(),
+                n_workers
+            )
+            for size, itemsets in results:
+                total_transactions += size
+                candidates.update(itemsets)
+    else:
+        for partition in partition_source():
+            size, itemsets = _mine_partition(partition, min_support, max_len)
+            total_transactions += size
+            candidates.update(itemsets)
+    
+    if not candidates:
+        return {}
+    
+    # Pha 2: Đếm support toàn cục của các ứng viên
+    trie, item_rank = build_candidate_trie(candidates)
+    del candidates
+    
+    global_counts = defaultdict(int)
+    if n_workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_count_worker,
+            initargs=(trie, item_rank)
+        ) as executor:
+            for counts in _map_bounded(executor, _count_partition, partition_source(), n_workers):
+                for itemset, count in counts.items():
+                    global_counts[itemset] += count
+    else:
+        for partition in partition_source():
+            count_candidates(partition, trie, item_rank)
+        global_counts = dict(_trie_counts(trie))
+    
+    min_support_count = int(total_transactions * min_support)
+    return {
+        frozenset(itemset): count
+        for itemset, count in global_counts.items()
+        if count >= min_support_count and count > 0
+    }
+
+
+def mine_fp_tree_sampled(transactions, min_support, sample_size, delta=0.05,
+                         confirm=True, seed=None, max_len=None, compact=False, n_workers=1):
+    """
+    Khai phá xấp xỉ trên một mẫu ngẫu nhiên các transactions.
+    
+    Với mẫu n transactions và ngưỡng s, chặn Chernoff cho sai số tương
+    đối θ = sqrt(3·ln(2/δ) / (s·n)) nên ngưỡng trên mẫu được hạ xuống
+    (1 - θ)·s·n: một itemset có support thật >= s bị bỏ sót với xác suất
+    không quá δ. Sai số tuyệt đối của support ước lượng từ mẫu được chặn
+    theo Hoeffding: ε = sqrt(ln(2/δ) / (2n)).
+    - confirm=True: đếm lại support chính xác của các ứng viên trong một
+      lượt duyệt toàn bộ dữ liệu và lọc theo ngưỡng thật (support chính
+      xác, chỉ còn khả năng bỏ sót với xác suất nhỏ).
+    - confirm=False: support được ngoại suy từ mẫu, sai số tối đa ε * N.
+    
+    Args:
+        transactions: Danh sách các transactions
+        min_support: Ngưỡng support tối thiểu dạng tỉ lệ (0-1)
+        sample_size: Số transactions lấy mẫu
+        delta: Xác suất vượt sai số cho phép (0-1)
+        confirm: Có đếm lại support trên toàn bộ dữ liệu hay không
+        seed: Seed cho việc lấy mẫu
+        max_len: Độ dài itemset tối đa (None = không giới hạn)
+        compact: Nếu True, khai phá mẫu bằng CompactFPTree
+        n_workers: Số process khai phá mẫu (> 1: mine_fp_tree_parallel)
+    
+    Returns:
+        Tuple (frequent_itemsets, support_error) với frequent_itemsets là
+        dictionary {frozenset: support count trên toàn bộ dữ liệu} và
+        support_error là sai số ước lượng của support count (0 nếu confirm)
+    """
+    total_transactions = len(transactions)
+    if total_transactions == 0:
+        return {}, 0
+    
+    sample_size = min(sample_size, total_transactions)
+    sample = random.Random(seed).sample(transactions, sample_size)
+    epsilon = math.sqrt(math.log(2 / delta) / (2 * sample_size))
+    slack = min(1.0, math.sqrt(3 * math.log(2 / delta) / (min_support * sample_size)))
+    
+    sample_support_count = max(1, int((1 - slack) * min_support * sample_size))
+    if n_workers > 1:
+        sample_itemsets = mine_fp_tree_parallel(
+            sample, sample_support_count, n_workers=n_workers, compact=compact, max_len=max_len
+        )
+    else:
+        sample_itemsets = mine_fp_tree(sample, sample_support_count, compact=compact, max_len=max_len)
+    
+    min_support_count = int(total_transactions * min_support)
+    if confirm:
+        if not sample_itemsets:
+            return {}, 0
+        trie, item_rank = build_candidate_trie(sample_itemsets)
+        count_candidates(transactions, trie, item_rank)
+        frequent_itemsets = {
+            frozenset(itemset): count for itemset, count in _trie_counts(trie)
+            if count >= min_support_count and count > 0
+        }
+        return frequent_itemsets, 0
+    
+    # Ngoại suy support count từ mẫu lên toàn bộ dữ liệu
+    scale = total_transactions / sample_size
+    frequent_itemsets = {
+        itemset: round(count * scale) for itemset, count in sample_itemsets.items()
+        if round(count * scale) >= min_support_count
+    }
+    return frequent_itemsets, epsilon * total_transactions
@@ -4,16 +4,62 @@ Chứa mọi logic I/O và chuẩn hóa (load, save, normalize).
 """
 
 import csv
+import hashlib
+import json
 import logging
-from collections import defaultdict
+import os
+import re
+import shutil
+from functools import lru_cache
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+# Version định dạng cache transactions (tăng khi đổi cách đọc / mã hóa)
+TRANSACTION_CACHE_VERSION = 1
+
+# Số tên khác nhau tối đa được nhớ cho mỗi hàm chuẩn hóa (~2000 tên đường)
+NORMALIZE_CACHE_SIZE = 8192
+
+DISTRICT_PREFIXES = ['Quận ', 'Huyện ', 'Thị xã ', 'Thành phố ']
+ROAD_PREFIXES = [
+    'Phố ',
+    'Đường ',
+    'Cầu ',
+    'Hầm Chui ',
+    'Cầu Vượt ',
+    'Ngõ ',
+    'Đại lộ ',
+    'Quốc lộ ',
+    'Quốc Lộ ',
+    'Tuyến ',
+    'Tuyến Số ',
+    'Đường Cao Tốc ',
+    'Cao Tốc ',
+]
+
+
+def _compile_prefixes(prefixes):
+    """
+    Biên dịch danh sách tiền tố thành một regex. Các nhánh được thử theo
+    đúng thứ tự trong list, nên tiền tố khớp đầu tiên thắng như khi duyệt
+    startswith lần lượt.
+    """
+    return re.compile('|'.join(re.escape(prefix) for prefix in prefixes))
+
+
+_DISTRICT_PREFIX_RE = _compile_prefixes(DISTRICT_PREFIXES)
+_ROAD_PREFIX_RE = _compile_prefixes(ROAD_PREFIXES)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_district_name(district):
     """
     Loại bỏ tiền tố 'Quận ', 'Huyện ' để gom nhóm.
     Giải pháp: Normalize tên quận để tăng khả năng tìm patterns.
+    Kết quả được nhớ (LRU) theo tên gốc.
     
     Args:
         district: Tên quận gốc
@@ -22,17 +68,16 @@ def normalize_district_name(district):
         Tên quận đã chuẩn hóa
     """
     district = district.strip()
-    prefixes = ['Quận ', 'Huyện ', 'Thị xã ', 'Thành phố ']
-    for prefix in prefixes:
-        if district.startswith(prefix):
-            return district[len(prefix):]
-    return district
+    match = _DISTRICT_PREFIX_RE.match(district)
+    return district[match.end():] if match else district
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_road_name(road):
     """
     Loại bỏ tiền tố 'Phố ', 'Đường ', 'Cầu ', v.v. để gom nhóm tên đường.
     Chuẩn hóa tên đường để tăng khả năng tìm patterns.
+    Kết quả được nhớ (LRU) theo tên gốc.
     
     Args:
         road: Tên đường gốc
@@ -41,25 +86,37 @@ def normalize_road_name(road):
         Tên đường đã chuẩn hóa
     """
     road = road.strip()
-    prefixes = [
-        'Phố ',
-        'Đường ',
-        'Cầu ',
-        'Hầm Chui ',
-        'Cầu Vượt ',
-        'Ngõ ',
-        'Đại lộ ',
-        'Quốc lộ ',
-        'Quốc Lộ ',
-        'Tuyến ',
-        'Tuyến Số ',
-        'Đường Cao Tốc ',
-        'Cao Tốc ',
-    ]
-    for prefix in prefixes:
-        if road.startswith(prefix):
-            return road[len(prefix):]
-    return road
+    match = _ROAD_PREFIX_RE.match(road)
+    return road[match.end():] if match else road
+
+
+def normalization_cache_stats():
+    """
+    Thống kê cache của các hàm chuẩn hóa.
+    
+    Returns:
+        Dictionary {'district': {...}, 'road_name': {...}} với hits, misses,
+        size, maxsize và hit_rate (0-1)
+    """
+    stats = {}
+    for column_name, normalize in (('district', normalize_district_name),
+                                   ('road_name', normalize_road_name)):
+        info = normalize.cache_info()
+        lookups = info.hits + info.misses
+        stats[column_name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+            'hit_rate': info.hits / lookups if lookups else 0.0
+        }
+    return stats
+
+
+def clear_normalization_cache():
+    """Xóa cache (và thống kê) của các hàm chuẩn hóa."""
+    normalize_district_name.cache_clear()
+    normalize_road_name.cache_clear()
 
 
 def load_transactions_from_csv(filepath, column_name):
@@ -74,34 +131,8 @@ def load_transactions_from_csv(filepath, column_name):
     Returns:
         List các transactions (mỗi transaction là một list các items)
     """
-    transactions_dict = defaultdict(set)
-    
     try:
-        # Sử dụng 'utf-8-sig' để tự động loại bỏ BOM nếu có
-        with open(filepath, 'r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            
-            # Debug: In ra tên các columns
-            if reader.fieldnames:
-                logger.info(f"Các cột trong CSV: {reader.fieldnames}")
-            
-            row_count = 0
-            for row in reader:
-                trip_id = row.get('trip_id', '').strip()
-                item = row.get(column_name, '').strip()
-                
-                if trip_id and item:
-                    # Normalize tên quận hoặc đường
-                    if column_name == 'district':
-                        item = normalize_district_name(item)
-                    elif column_name == 'road_name':
-                        item = normalize_road_name(item)
-                    
-                    transactions_dict[trip_id].add(item)
-                    row_count += 1
-            
-            logger.info(f"Đã đọc {row_count} dòng dữ liệu")
-            logger.info(f"Tạo được {len(transactions_dict)} transactions (trip_id unique)")
+        trips = load_trip_transactions(filepath, columns=(column_name,))
     except FileNotFoundError:
         logger.error(f"Không tìm thấy file '{filepath}'")
         return []
@@ -109,9 +140,426 @@ def load_transactions_from_csv(filepath, column_name):
         logger.error(f"Lỗi khi đọc file: {e}")
         return []
     
-    # Chuyển đổi dict thành list of lists
-    transactions = [list(items) for items in transactions_dict.values()]
-    return transactions
+    logger.info(f"Tạo được {len(trips)} transactions (trip_id unique)")
+    return trips.sets(column_name)
+
+
+def iter_transaction_chunks(filepath, column_name, chunk_size, normalize=True, trip_ids=None,
+                            min_length=1):
+    """
+    Đọc CSV theo kiểu streaming và trả về transactions theo từng chunk.
+    Dùng cho khai phá theo partitions (SON) khi lịch sử quá lớn để nạp
+    toàn bộ vào bộ nhớ.
+    
+    Các dòng của cùng một trip_id phải nằm liền nhau trong file (như
+    optimized_routes_standard.csv); nếu một trip_id xuất hiện lại sau trip
+    khác, ValueError được raise thay vì đếm trip đó thành hai transactions.
+    Mỗi transaction là list items duy nhất (thứ tự xuất hiện đầu tiên),
+    giống load_transactions_from_csv.
+    
+    Args:
+        filepath: Đường dẫn đến file CSV
+        column_name: Tên cột cần trích xuất ('district' hoặc 'road_name')
+        chunk_size: Số transactions tối đa trong một chunk
+        normalize: Áp dụng normalize_district_name / normalize_road_name
+            (như load_trip_transactions)
+        trip_ids: Chỉ lấy các trips này (ví dụ tập train), None = mọi trips
+        min_length: Số items khác nhau tối thiểu của một transaction
+    
+    Yields:
+        List các transactions (mỗi transaction là một list các items)
+    
+    Raises:
+        ValueError: Nếu các dòng của một trip_id không nằm liền nhau
+    """
+    normalize_item = get_normalizer(column_name) if normalize else None
+    if trip_ids is not None:
+        trip_ids = set(trip_ids)
+    
+    chunk = []
+    current_trip = None
+    current_items = {}
+    # Chỉ giữ trip_id (không giữ items) để phát hiện trip bị tách
+    finished_trips = set()
+    
+    with open(filepath, 'r', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            trip_id = (row.get('trip_id') or '').strip()
+            if not trip_id:
+                continue
+            
+            if trip_id != current_trip:
+                if current_trip is not None:
+                    finished_trips.add(current_trip)
+                    if len(current_items) >= max(min_length, 1):
+                        chunk.append(list(current_items))
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                if trip_id in finished_trips:
+                    raise ValueError(
+                        f"Các dòng của trip_id '{trip_id}' không nằm liền nhau trong '{filepath}'"
+                    )
+                current_trip = trip_id
+                current_items = {}
+            
+            item = (row.get(column_name) or '').strip()
+            if not item or (trip_ids is not None and trip_id not in trip_ids):
+                continue
+            if normalize_item is not None:
+                item = normalize_item(item)
+            current_items[item] = None
+    
+    if len(current_items) >= max(min_length, 1):
+        chunk.append(list(current_items))
+    if chunk:
+        yield chunk
+
+
+class TripTransactions:
+    """
+    Transactions của nhiều cột (ví dụ district và road_name) theo trip_id,
+    đọc từ một lượt duyệt CSV duy nhất.
+    
+    Mỗi trip lưu chuỗi items theo thứ tự xuất hiện, đã loại duplicates liền
+    kề (['A','B','B','C'] -> ['A','B','C']); dạng set (items duy nhất) được
+    suy ra khi cần.
+    """
+    def __init__(self, trip_ids, sequences, row_counts, encoded=None):
+        """
+        Args:
+            trip_ids: List trip_id theo thứ tự xuất hiện đầu tiên
+            sequences: Dictionary {column: list các chuỗi items (cùng thứ tự trip_ids)}
+            row_counts: List số dòng CSV của mỗi trip
+            encoded: Dictionary {column: (vocabulary, offsets, item_ids)} dạng
+                CSR cho các cột chưa giải mã (giải mã khi dùng lần đầu)
+        """
+        self.trip_ids = trip_ids
+        self.sequences = dict(sequences)
+        self.row_counts = row_counts
+        self._encoded = dict(encoded or {})
+    
+    def __len__(self):
+        return len(self.trip_ids)
+    
+    @property
+    def columns(self):
+        """Các cột đã đọc."""
+        return list(dict.fromkeys([*self.sequences, *self._encoded]))
+    
+    @property
+    def n_rows(self):
+        """Tổng số dòng dữ liệu của các trips."""
+        return int(sum(self.row_counts))
+    
+    def column_sequences(self, column):
+        """List các chuỗi items của cột (cùng thứ tự trip_ids)."""
+        sequences = self.sequences.get(column)
+        if sequences is None:
+            vocabulary, offsets, item_ids = self._encoded[column]
+            item_ids = item_ids.tolist()
+            bounds = offsets.tolist()
+            sequences = self.sequences[column] = [
+                [vocabulary[item_id] for item_id in item_ids[start:end]]
+                for start, end in zip(bounds, bounds[1:])
+            ]
+        return sequences
+    
+    def encode(self, column):
+        """
+        Mã hóa cột thành dạng CSR.
+        
+        Returns:
+            Tuple (vocabulary, offsets, item_ids) với offsets là np.ndarray
+            int64 shape (n_trips + 1,) và item_ids là np.ndarray int32
+        """
+        if column in self._encoded:
+            return self._encoded[column]
+        
+        item_ids = {}
+        encoded = []
+        offsets = [0]
+        for items in self.sequences[column]:
+            for item in items:
+                item_id = item_ids.get(item)
+                if item_id is None:
+                    item_id = item_ids[item] = len(item_ids)
+                encoded.append(item_id)
+            offsets.append(len(encoded))
+        return (
+            list(item_ids),
+            np.array(offsets, dtype=np.int64),
+            np.array(encoded, dtype=np.int32)
+        )
+    
+    def ordered(self, column, min_length=1):
+        """
+        Transactions dạng chuỗi có thứ tự (đã loại duplicates liền kề).
+        
+        Args:
+            column: Tên cột ('district' hoặc 'road_name')
+            min_length: Độ dài tối thiểu của transaction
+        
+        Returns:
+            List các transactions (mỗi transaction là một list các items)
+        """
+        return [items for items in self.column_sequences(column) if len(items) >= min_length]
+    
+    def ordered_by_trip(self, column, min_length=1):
+        """Như ordered nhưng trả về dict {trip_id: transaction}."""
+        return {
+            trip_id: items
+            for trip_id, items in zip(self.trip_ids, self.column_sequences(column))
+            if len(items) >= min_length
+        }
+    
+    def sets(self, column, min_length=1):
+        """
+        Transactions dạng set: items duy nhất của mỗi trip (giữ thứ tự xuất
+        hiện đầu tiên), giống load_transactions_from_csv.
+        
+        Returns:
+            List các transactions (mỗi transaction là một list các items)
+        """
+        transactions = []
+        for items in self.column_sequences(column):
+            unique_items = list(dict.fromkeys(items))
+            if len(unique_items) >= min_length:
+                transactions.append(unique_items)
+        return transactions
+    
+    def subset(self, trip_ids):
+        """
+        Lấy các trips theo danh sách trip_ids (giữ thứ tự của trip_ids).
+        
+        Returns:
+            TripTransactions mới
+        """
+        position = {trip_id: idx for idx, trip_id in enumerate(self.trip_ids)}
+        indices = [position[trip_id] for trip_id in trip_ids]
+        sequences = {column: self.column_sequences(column) for column in self.columns}
+        return TripTransactions(
+            [self.trip_ids[idx] for idx in indices],
+            {
+                column: [column_sequences[idx] for idx in indices]
+                for column, column_sequences in sequences.items()
+            },
+            [self.row_counts[idx] for idx in indices]
+        )
+
+
+def get_normalizer(column_name):
+    """
+    Hàm chuẩn hóa (có memo) tương ứng với cột.
+    
+    Args:
+        column_name: Tên cột ('district' hoặc 'road_name')
+    
+    Returns:
+        Hàm chuẩn hóa, hoặc None nếu cột không cần chuẩn hóa
+    """
+    if column_name == 'district':
+        return normalize_district_name
+    if column_name == 'road_name':
+        return normalize_road_name
+    return None
+
+
+def load_trip_transactions(filepath, columns=('district', 'road_name'), normalize=True,
+                           cache_dir=None):
+    """
+    Đọc CSV một lần và tạo transactions cho nhiều cột cùng lúc.
+    
+    Dùng csv.reader theo chỉ số cột (không tạo dict cho mỗi dòng); các
+    dòng của cùng một trip_id không cần nằm liền nhau.
+    
+    Args:
+        filepath: Đường dẫn đến file CSV
+        columns: Các cột cần trích xuất
+        normalize: Áp dụng normalize_district_name / normalize_road_name
+        cache_dir: Thư mục cache transactions đã mã hóa (None = không cache).
+            Lần đọc sau với cùng nội dung file và cấu hình sẽ nạp cache
+            bằng mmap thay vì parse lại CSV.
+    
+    Returns:
+        TripTransactions
+    """
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, transaction_cache_key(filepath, columns, normalize))
+        if os.path.isdir(cache_path):
+            trips = load_transaction_cache(cache_path)
+            if trips is not None:
+                logger.info(f"Đã nạp {len(trips)} trips từ cache '{cache_path}'")
+                return trips
+        
+        trips = load_trip_transactions(filepath, columns, normalize)
+        os.makedirs(cache_dir, exist_ok=True)
+        source = {'path': os.path.abspath(filepath), 'columns': list(columns), 'normalize': bool(normalize)}
+        save_transaction_cache(trips, cache_path, source)
+        return trips
+    
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.reader(file)
+        header = [name.strip() for name in next(reader, [])]
+        
+        missing = [name for name in ('trip_id', *columns) if name not in header]
+        if missing:
+            raise ValueError(f"Thiếu cột trong CSV: {missing}")
+        
+        trip_col = header.index('trip_id')
+        column_specs = [
+            (header.index(column), get_normalizer(column) if normalize else None)
+            for column in columns
+        ]
+        min_width = max(trip_col, *(idx for idx, _ in column_specs)) + 1
+        
+        trip_position = {}
+        trip_ids = []
+        row_counts = []
+        sequences = [[] for _ in columns]
+        
+        for row in reader:
+            if len(row) < min_width:
+                continue
+            trip_id = row[trip_col].strip()
+            if not trip_id:
+                continue
+            
+            pos = trip_position.get(trip_id)
+            if pos is None:
+                pos = trip_position[trip_id] = len(trip_ids)
+                trip_ids.append(trip_id)
+                row_counts.append(0)
+                for column_sequences in sequences:
+                    column_sequences.append([])
+            row_counts[pos] += 1
+            
+            for column_sequences, (col, normalize_item) in zip(sequences, column_specs):
+                item = row[col].strip()
+                if not item:
+                    continue
+                if normalize_item is not None:
+                    item = normalize_item(item)
+                
+                # Loại duplicates liền kề (giữ thứ tự)
+                items = column_sequences[pos]
+                if not items or items[-1] != item:
+                    items.append(item)
+    
+    logger.info(f"Đã đọc {sum(row_counts)} dòng dữ liệu, {len(trip_ids)} trips")
+    return TripTransactions(trip_ids, dict(zip(columns, sequences)), row_counts)
+
+
+def file_fingerprint(filepath, chunk_size=1 << 20):
+    """SHA-256 của nội dung file (đọc theo từng khối)."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def transaction_cache_key(filepath, columns, normalize):
+    """
+    Khóa cache: hash nội dung file + cột + cấu hình chuẩn hóa (kể cả danh
+    sách tiền tố), nên đổi dữ liệu hoặc quy tắc chuẩn hóa sẽ tạo cache mới.
+    """
+    settings = {
+        'version': TRANSACTION_CACHE_VERSION,
+        'file': file_fingerprint(filepath),
+        'columns': list(columns),
+        'normalize': bool(normalize),
+        'prefixes': [DISTRICT_PREFIXES, ROAD_PREFIXES] if normalize else None
+    }
+    return hashlib.sha256(json.dumps(settings, ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+
+
+def save_transaction_cache(trips, cache_path, source=None):
+    """
+    Lưu TripTransactions dạng CSR (offsets + item IDs + vocabulary) vào
+    thư mục cache_path (.npy cho các mảng, meta.json cho phần còn lại).
+    
+    Nếu có source (đường dẫn file, cột, cấu hình chuẩn hóa), các cache
+    khác trong cùng thư mục có cùng source (các phiên bản cũ của file)
+    bị xóa sau khi ghi xong.
+    """
+    temp_path = f"{cache_path}.tmp{os.getpid()}"
+    os.makedirs(temp_path, exist_ok=True)
+    
+    meta = {'version': TRANSACTION_CACHE_VERSION, 'source': source, 'trip_ids': trips.trip_ids, 'columns': {}}
+    np.save(os.path.join(temp_path, 'row_counts.npy'), np.asarray(trips.row_counts, dtype=np.int64))
+    for idx, column in enumerate(trips.columns):
+        vocabulary, offsets, item_ids = trips.encode(column)
+        np.save(os.path.join(temp_path, f'offsets_{idx}.npy'), offsets)
+        np.save(os.path.join(temp_path, f'items_{idx}.npy'), item_ids)
+        meta['columns'][column] = {'index': idx, 'vocabulary': vocabulary}
+    with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False)
+    
+    # Đổi tên sau khi ghi xong để không bao giờ đọc phải cache dở dang
+    try:
+        os.replace(temp_path, cache_path)
+    except OSError:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        return
+    
+    if source is not None:
+        evict_transaction_caches(os.path.dirname(cache_path), source, keep=cache_path)
+
+
+def evict_transaction_caches(cache_dir, source, keep=None):
+    """
+    Xóa các cache trong cache_dir được tạo từ cùng source (trừ keep).
+    
+    Returns:
+        Số cache đã xóa
+    """
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as file:
+                meta_source = json.load(file).get('source')
+        except (OSError, ValueError):
+            continue
+        if meta_source == source:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Đã xóa cache transactions cũ '{path}'")
+            removed += 1
+    return removed
+
+
+def load_transaction_cache(cache_path):
+    """
+    Đọc TripTransactions từ cache (các mảng được mmap, chuỗi items chỉ
+    được giải mã khi dùng tới).
+    
+    Returns:
+        TripTransactions, hoặc None nếu cache không hợp lệ
+    """
+    try:
+        with open(os.path.join(cache_path, 'meta.json'), encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta.get('version') != TRANSACTION_CACHE_VERSION:
+            return None
+        
+        encoded = {}
+        for column, info in meta['columns'].items():
+            idx = info['index']
+            encoded[column] = (
+                info['vocabulary'],
+                np.load(os.path.join(cache_path, f'offsets_{idx}.npy'), mmap_mode='r'),
+                np.load(os.path.join(cache_path, f'items_{idx}.npy'), mmap_mode='r')
+            )
+        row_counts = np.load(os.path.join(cache_path, 'row_counts.npy'), mmap_mode='r')
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Bỏ qua cache transactions hỏng '{cache_path}': {e}")
+        return None
+    
+    return TripTransactions(meta['trip_ids'], {}, row_counts, encoded=encoded)
 
 
 def save_rules_to_csv(rules, filepath, config):
@@ -119,7 +567,7 @@ def save_rules_to_csv(rules, filepath, config):
     Lưu các rules vào file CSV với định dạng yêu cầu và thông tin bổ sung.
     
     Args:
-        rules: List các rules
+        rules: List các rules hoặc RuleSet
         filepath: Đường dẫn file CSV đầu ra
         config: Config để hiển thị thông tin
     """
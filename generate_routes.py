@@ -5,9 +5,13 @@ Tạo tuyến đường từ orders dựa trên association rules đã train
 
 import pandas as pd
 import logging
+import os
 import random
 from collections import defaultdict
 
+from prediction import PathPredictor, RuleIndex
+from rule_set import RuleSet, rules_artifact_path
+
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
@@ -26,7 +30,7 @@ def load_drivers(drivers_file):
     
     Args:
         drivers_file: Đường dẫn đến file drivers.csv
-        
+    
     Returns:
         List driver IDs đang active
     """
@@ -45,7 +49,7 @@ def load_drivers(drivers_file):
 
 
 def load_rules_from_csv(file_path, rule_type='district'):
-    """Load rules từ CSV file"""
+    """Load rules từ CSV file thành RuleSet"""
     import ast
     
     df = pd.read_csv(file_path)
@@ -64,39 +68,39 @@ def load_rules_from_csv(file_path, rule_type='district'):
             logger.warning(f"Bỏ qua rule không hợp lệ: {e}")
             continue
     
-    return rules
+    return RuleSet.from_rules(rules)
 
 
-def predict_next_locations(current_path, rules, top_k=5):
-    """Dự đoán vị trí tiếp theo - ưu tiên rules khớp SEQUENCE"""
-    if not current_path:
-        return []
-    
-    candidates = {}
-    current_set = set(current_path)
-    
-    for rule in rules:
-        ant = rule['antecedents'] if isinstance(rule['antecedents'], set) else set(rule['antecedents'])
-        cons = rule['consequents'] if isinstance(rule['consequents'], set) else set(rule['consequents'])
-        
-        # Kiểm tra rule có match không
-        if not ant.issubset(current_set):
-            continue
-        
-        # Tính score dựa trên độ gần với tail của current_path
-        base_score = rule['confidence'] * rule.get('quality_score', rule['lift'])
-        
-        # Bonus nếu antecedents xuất hiện gần cuối path
-        recent_items = set(current_path[-min(3, len(current_path)):])
-        overlap = len(ant & recent_items) / len(ant) if ant else 0
-        position_bonus = 1.0 + overlap  # Bonus 0-100%
-        
-        for location in cons:
-            if location not in current_set:
-                score = base_score * position_bonus
-                candidates[location] = candidates.get(location, 0) + score
-    
-    return [loc for loc, _ in sorted(candidates.items(), key=lambda x: x[1], reverse=True)[:top_k]]
+def load_rules(file_path):
+    """
+    Load rules cho một loại: ưu tiên model nhị phân (.rules, mmap) cạnh
+    file CSV, trừ khi CSV mới hơn (ví dụ đã sửa tay hoặc train lại chỉ
+    xuất CSV). file_path cũng có thể là chính file .rules. Model nhị phân
+    hỏng hoặc khác version được bỏ qua nếu còn CSV để đọc.
+    """
+    artifact_file = rules_artifact_path(file_path)
+    has_csv = file_path != artifact_file and os.path.exists(file_path)
+    use_artifact = os.path.exists(artifact_file) and (
+        not has_csv or os.path.getmtime(artifact_file) >= os.path.getmtime(file_path)
+    )
+    
+    rules = None
+    if use_artifact:
+        try:
+            rules = RuleSet.load(artifact_file)
+            loaded_file = artifact_file
+        except (OSError, ValueError) as e:
+            if not has_csv:
+                raise
+            logger.warning(f"⚠️  Không đọc được {artifact_file} ({e}), dùng CSV")
+    elif os.path.exists(artifact_file):
+        logger.warning(f"⚠️  {file_path} mới hơn {artifact_file}, dùng CSV")
+    
+    if rules is None:
+        rules = load_rules_from_csv(file_path)
+        loaded_file = file_path
+    logger.info(f"📋 Loaded {len(rules)} rules from {loaded_file}")
+    return rules
 
 
 def optimize_route_order(districts, rules):
@@ -104,23 +108,23 @@ def optimize_route_order(districts, rules):
     if not districts or not rules:
         return districts
     
-    optimized = [districts[0]]
+    predictor = PathPredictor(rules, [districts[0]])
     remaining = set(districts[1:])
     
     while remaining:
         # Dự đoán quận tiếp theo dựa trên path hiện tại
-        predictions = predict_next_locations(optimized, rules, top_k=3)
+        predictions = predictor.predict(top_k=3)
         best_next = next((p for p in predictions if p in remaining), None)
         
         if best_next:
-            optimized.append(best_next)
+            predictor.extend(best_next)
             remaining.discard(best_next)
         else:
             # Nếu không có prediction, lấy ngẫu nhiên
             next_district = remaining.pop()
-            optimized.append(next_district)
+            predictor.extend(next_district)
     
-    return optimized
+    return predictor.path
 
 
 def create_initial_routes(orders_df, max_orders_per_route=MAX_ORDERS_PER_ROUTE):
@@ -212,8 +216,9 @@ def generate_routes_from_orders(orders_file, district_rules_file, road_rules_fil
     
     Args:
         orders_file: Path to orders CSV file
-        district_rules_file: Path to district rules CSV file
-        road_rules_file: Path to road rules CSV file
+        district_rules_file: Path to district rules CSV (or .rules) file; a sibling .rules model
+            is preferred unless the CSV is newer
+        road_rules_file: Path to road rules CSV (or .rules) file, same lookup as district_rules_file
         drivers_file: Path to drivers CSV file
         output_file: Path to output routes CSV file
         max_orders_per_route: Maximum orders per route
@@ -228,8 +233,8 @@ def generate_routes_from_orders(orders_file, district_rules_file, road_rules_fil
     # Load data
     logger.info(f"\n📥 Loading data...")
     orders_df = pd.read_csv(orders_file)
-    district_rules = load_rules_from_csv(district_rules_file)
-    road_rules = load_rules_from_csv(road_rules_file)
+    district_rules = RuleIndex(load_rules(district_rules_file))
+    road_rules = RuleIndex(load_rules(road_rules_file))
     
     logger.info(f"   ✓ Orders: {len(orders_df)}")
     logger.info(f"   ✓ District rules: {len(district_rules)}")
@@ -294,8 +299,8 @@ def main():
     
     parser = argparse.ArgumentParser(description='Generate optimized routes from orders')
     parser.add_argument('--orders', default=ORDERS_FILE, help='Path to orders CSV file')
-    parser.add_argument('--district-rules', default=DISTRICT_RULES_FILE, help='Path to district rules CSV file')
-    parser.add_argument('--road-rules', default=ROAD_RULES_FILE, help='Path to road rules CSV file')
+    parser.add_argument('--district-rules', default=DISTRICT_RULES_FILE, help='Path to district rules CSV (or .rules) file')
+    parser.add_argument('--road-rules', default=ROAD_RULES_FILE, help='Path to road rules CSV (or .rules) file')
     parser.add_argument('--drivers', default=DRIVERS_FILE, help='Path to drivers CSV file')
     parser.add_argument('--output', default=OUTPUT_ROUTES, help='Path to output routes CSV file')
     parser.add_argument('--max-orders', type=int, default=MAX_ORDERS_PER_ROUTE, help='Max orders per route')
@@ -313,7 +318,7 @@ def main():
         )
         
         logger.info(f"✅ Success! Generated {result_df['route_id'].nunique()} routes")
-        
+    
     except FileNotFoundError as e:
         logger.error(f"❌ File not found: {e}")
         logger.error(f"\nMake sure you have:")
@@ -321,7 +326,7 @@ def main():
         logger.error(f"  2. District rules: {args.district_rules}")
         logger.error(f"  3. Road rules: {args.road_rules}")
         logger.error(f"\nRun 'python main.py' first to generate rules!")
-        
+    
     except Exception as e:
         logger.error(f"❌ Error: {e}")
         import traceback
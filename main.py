@@ -1,12 +1,22 @@
 """Train + Test FP-Growth với Split 80/20"""
 
-import pandas as pd
+import hashlib
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
-from config import DISTRICT_CONFIG, ROAD_CONFIG
-from data_handler import save_rules_to_csv
-from core_fptree import mine_fp_tree
-from association_rules import generate_association_rules
+from config import DISTRICT_CONFIG, NORMALIZE_NAMES, ROAD_CONFIG
+from data_handler import (
+    TripTransactions, get_normalizer, load_trip_transactions, normalization_cache_stats, save_rules_to_csv
+)
+from core_fptree import CanTree, mine_fp_tree, mine_fp_tree_parallel, mine_fp_tree_sampled, mine_partitioned
+from core_eclat import mine_eclat
+from rule_set import RuleSet, rules_artifact_path
+from prediction import PathPredictor, RuleIndex
+from association_rules import (
+    generate_association_rules, generate_association_rules_batch, generate_association_rules_parallel,
+    prune_redundant_rules
+)
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
@@ -15,35 +25,101 @@ logger = logging.getLogger(__name__)
 DATA_FILE = 'data/optimized_routes_standard.csv'
 OUTPUT_DISTRICT_RULES = 'output/district_rules_trained.csv'
 OUTPUT_ROAD_RULES = 'output/road_rules_trained.csv'
+TRANSACTION_CACHE_DIR = 'cache/transactions'
 TRAIN_RATIO = 0.8
 
 
 def split_data_by_routes(data_file, train_ratio=0.8):
-    """Chia dữ liệu theo routes (80/20)"""
+    """Chia dữ liệu theo routes (80/20) - đọc CSV một lần cho cả quận và đường"""
     logger.info("\n" + "="*70 + "\n📊 PHẦN 1: CHIA DỮ LIỆU TRAIN/TEST\n" + "="*70)
     
-    df = pd.read_csv(data_file)
-    logger.info(f"\n✓ Loaded {len(df)} transactions")
+    trips = load_trip_transactions(
+        data_file, columns=('district', 'road_name'), normalize=NORMALIZE_NAMES,
+        cache_dir=TRANSACTION_CACHE_DIR
+    )
+    logger.info(f"\n✓ Loaded {trips.n_rows} transactions")
+    if NORMALIZE_NAMES:
+        log_normalization_stats()
     
-    unique_routes = df['trip_id'].unique()
+    unique_routes = trips.trip_ids
     logger.info(f"✓ Tổng số routes: {len(unique_routes)}")
     
-    train_routes, test_routes = train_test_split(unique_routes, train_size=train_ratio, random_state=42, shuffle=True)
-    train_df = df[df['trip_id'].isin(train_routes)]
-    test_df = df[df['trip_id'].isin(test_routes)]
+    if DISTRICT_CONFIG.get('incremental_tree') or ROAD_CONFIG.get('incremental_tree'):
+        # CanTree giữ mọi trip đã chèn: tập train/test phải ổn định khi CSV lớn dần
+        train_routes, test_routes = _stable_split(unique_routes, train_ratio)
+    else:
+        train_routes, test_routes = train_test_split(unique_routes, train_size=train_ratio, random_state=42, shuffle=True)
+    train_trips = trips.subset(_groupby_order(train_routes))
+    test_trips = trips.subset(_groupby_order(test_routes))
     
     logger.info(f"\n📈 Kết quả chia dữ liệu:")
-    logger.info(f"   • Train: {len(train_routes)} routes ({len(train_df)} transactions) - {len(train_routes)/len(unique_routes)*100:.1f}%")
-    logger.info(f"   • Test:  {len(test_routes)} routes ({len(test_df)} transactions) - {len(test_routes)/len(unique_routes)*100:.1f}%")
+    logger.info(f"   • Train: {len(train_routes)} routes ({train_trips.n_rows} transactions) - {len(train_routes)/len(unique_routes)*100:.1f}%")
+    logger.info(f"   • Test:  {len(test_routes)} routes ({test_trips.n_rows} transactions) - {len(test_routes)/len(unique_routes)*100:.1f}%")
+    
+    return train_trips, test_trips
+
+
+def _stable_split(trip_ids, train_ratio):
+    """
+    Chia trips theo hash của trip_id: một trip luôn thuộc cùng một tập dù
+    CSV có thêm trips mới, nên trips đã chèn vào CanTree không bao giờ rơi
+    vào tập test ở lần chạy sau.
     
-    return train_df, test_df
+    Returns:
+        Tuple (train_routes, test_routes)
+    """
+    train_routes, test_routes = [], []
+    for trip_id in trip_ids:
+        digest = hashlib.sha256(str(trip_id).encode('utf-8')).digest()
+        if int.from_bytes(digest[:8], 'big') < train_ratio * 2**64:
+            train_routes.append(trip_id)
+        else:
+            test_routes.append(trip_id)
+    return train_routes, test_routes
+
+
+def _groupby_order(trip_ids):
+    """
+    Sắp xếp trip_ids như df.groupby('trip_id') (pandas đọc trip_id dạng số
+    thành int). Thứ tự transactions ảnh hưởng tới support khi trip ghé lại
+    một vị trí không liền kề, nên giữ đúng thứ tự của bản dùng DataFrame.
+    """
+    if all(trip_id.lstrip('-').isdigit() for trip_id in trip_ids):
+        return sorted(trip_ids, key=int)
+    return sorted(trip_ids)
+
+
+def log_normalization_stats():
+    """Log thống kê cache chuẩn hóa tên"""
+    for column_name, stats in normalization_cache_stats().items():
+        logger.info(f"✓ Cache chuẩn hóa {column_name}: {stats['hits']} hits / {stats['misses']} misses "
+                    f"({stats['hit_rate']*100:.1f}%), {stats['size']} tên")
+
+
+def _column_items(group, column_name):
+    """Lấy items của một cột trong group, chuẩn hóa nếu NORMALIZE_NAMES"""
+    items = group[column_name].dropna()
+    normalize = get_normalizer(column_name) if NORMALIZE_NAMES else None
+    if normalize is not None:
+        return [normalize(item) for item in items.astype(str)]
+    return items.tolist()
 
 
 def prepare_transactions(df, column_name, min_length=2):
-    """Chuẩn bị transactions từ DataFrame - giữ thứ tự, loại duplicates liền kề"""
+    """Chuẩn bị transactions từ DataFrame/TripTransactions - giữ thứ tự, loại duplicates liền kề"""
+    if isinstance(df, TripTransactions):
+        return df.ordered(column_name, min_length)
+    return list(prepare_transactions_by_trip(df, column_name, min_length).values())
+
+
+def prepare_transactions_by_trip(df, column_name, min_length=2):
+    """Như prepare_transactions nhưng trả về dict {trip_id: transaction}"""
+    if isinstance(df, TripTransactions):
+        return df.ordered_by_trip(column_name, min_length)
+    
     transactions = {}
     for trip_id, group in df.groupby('trip_id'):
-        items = group[column_name].dropna().tolist()
+        items = _column_items(group, column_name)
         
         # Loại bỏ duplicates liền kề (giữ thứ tự)
         # ['A','B','B','C','B','D'] -> ['A','B','C','B','D']
@@ -55,26 +131,142 @@ def prepare_transactions(df, column_name, min_length=2):
         if len(deduped) >= min_length:
             transactions[trip_id] = deduped
     
-    return list(transactions.values())
+    return transactions
+
+
+def mine_patterns(trans_list, min_support_count, config):
+    """Khai phá frequent itemsets theo engine/mode trong config"""
+    engine = config.get('engine', 'fptree')
+    n_jobs = config.get('n_jobs', 1)
+    itemset_mode = config.get('itemset_mode', 'all')
+    max_len = config.get('max_len')
+    partition_size = config.get('partition_size')
+    sample_size = config.get('sample_size')
+    compact = config.get('compact', False)
+    
+    if itemset_mode == 'maximal':
+        # Maximal itemsets không giữ support của các tập con: ClosedSupportLookup
+        # sẽ suy ra support sai và sinh rules sai
+        raise ValueError("itemset_mode='maximal' không dùng được để sinh rules; dùng 'all' hoặc 'closed'")
+    
+    if sample_size:
+        if itemset_mode != 'all':
+            raise ValueError("sample_size chỉ hỗ trợ itemset_mode='all'")
+        if engine != 'fptree':
+            raise ValueError("sample_size chỉ hỗ trợ engine 'fptree'")
+        if partition_size:
+            raise ValueError("Không dùng đồng thời sample_size và partition_size")
+        logger.info(f"   ⏳ Đang mine xấp xỉ trên mẫu {sample_size} transactions...")
+        patterns, support_error = mine_fp_tree_sampled(
+            trans_list, config['min_support'], sample_size, seed=42, max_len=max_len,
+            compact=compact, n_workers=n_jobs
+        )
+        logger.info(f"   • Sai số support ước lượng: ±{support_error:.0f} transactions")
+        return patterns
+    
+    if partition_size:
+        if itemset_mode != 'all':
+            raise ValueError("partition_size chỉ hỗ trợ itemset_mode='all'")
+        logger.info(f"   ⏳ Đang mine theo partitions (SON, {partition_size} transactions/partition)...")
+        # main.py đã nạp mọi trips để chia train/test, nên SON ở đây chỉ giới
+        # hạn kích thước FP-tree của mỗi partition chứ không khai phá ngoài bộ
+        # nhớ (ngoài bộ nhớ: mine_partitioned + data_handler.iter_transaction_chunks)
+        return mine_partitioned(
+            lambda: (trans_list[i:i + partition_size] for i in range(0, len(trans_list), partition_size)),
+            config['min_support'],
+            n_workers=n_jobs,
+            max_len=max_len
+        )
+    
+    if engine == 'eclat':
+        if itemset_mode != 'all':
+            raise ValueError("engine 'eclat' chỉ hỗ trợ itemset_mode='all'")
+        logger.info(f"   ⏳ Đang mine Eclat (bitset)...")
+        return mine_eclat(trans_list, min_support_count, max_len=max_len)
+    if engine != 'fptree':
+        raise ValueError(f"engine không hợp lệ: '{engine}'")
+    
+    if n_jobs > 1 and itemset_mode == 'all':
+        logger.info(f"   ⏳ Đang mine FP-tree song song trên {n_jobs} processes...")
+        return mine_fp_tree_parallel(
+            trans_list, min_support_count, n_workers=n_jobs, compact=compact, max_len=max_len
+        )
+    
+    logger.info(f"   ⏳ Đang mine FP-tree ({itemset_mode})... (có thể mất vài phút)")
+    return mine_fp_tree(
+        trans_list, min_support_count=min_support_count, compact=compact,
+        mode=itemset_mode, max_len=max_len
+    )
+
+
+def mine_incremental(df, column_name, config):
+    """Cập nhật CanTree đã lưu với các trips mới rồi khai phá lại"""
+    tree_file = config['incremental_tree']
+    metadata = {
+        'column': column_name,
+        'normalize_names': NORMALIZE_NAMES,
+        'split': 'trip_id_hash',
+        'train_ratio': TRAIN_RATIO,
+    }
+    if os.path.exists(tree_file):
+        tree = CanTree.load(tree_file)
+        if getattr(tree, 'metadata', None) != metadata:
+            raise ValueError(
+                f"CanTree '{tree_file}' được tạo với {getattr(tree, 'metadata', None)}, "
+                f"khác cấu hình hiện tại {metadata}; xóa file để build lại"
+            )
+    else:
+        tree = CanTree(metadata)
+    
+    transactions = prepare_transactions_by_trip(df, column_name)
+    added = tree.add_transactions(list(transactions.values()), keys=list(transactions.keys()))
+    tree.save(tree_file)
+    
+    min_support_count = int(tree.n_transactions * config['min_support'])
+    logger.info(f"   • Transactions: {tree.n_transactions} (+{added} mới) | Min support: {min_support_count}")
+    logger.info(f"   ⏳ Đang mine CanTree tăng dần ({tree_file})...")
+    return tree.mine(min_support_count, max_len=config.get('max_len')), tree.n_transactions
 
 
 def train_single_type(df, column_name, config, type_name, output_file):
     """Train FP-Growth cho một loại (quận/đường)"""
     logger.info(f"\n{'📍' if type_name == 'QUẬN' else '🛣️ '} Train luật theo {type_name}:")
     
-    trans_list = prepare_transactions(df, column_name)
-    min_support_count = int(len(trans_list) * config['min_support'])
-    logger.info(f"   • Transactions: {len(trans_list)} | Min support: {min_support_count}")
-    
-    logger.info(f"   ⏳ Đang mine FP-tree... (có thể mất vài phút)")
-    patterns = mine_fp_tree(trans_list, min_support_count=min_support_count)
+    if config.get('incremental_tree'):
+        patterns, total_transactions = mine_incremental(df, column_name, config)
+    else:
+        trans_list = prepare_transactions(df, column_name)
+        total_transactions = len(trans_list)
+        min_support_count = int(total_transactions * config['min_support'])
+        logger.info(f"   • Transactions: {total_transactions} | Min support: {min_support_count}")
+        
+        patterns = mine_patterns(trans_list, min_support_count, config)
     logger.info(f"   • Patterns: {len(patterns)}")
     
     logger.info(f"   ⏳ Đang sinh association rules...")
-    rules = generate_association_rules(patterns, len(trans_list), config)
+    if config.get('n_jobs', 1) > 1:
+        # Mỗi worker sinh rules theo lô nếu bật vectorized_rules
+        rules = generate_association_rules_parallel(
+            patterns, total_transactions, config, n_workers=config['n_jobs']
+        )
+    elif config.get('vectorized_rules'):
+        rules = generate_association_rules_batch(patterns, total_transactions, config)
+    else:
+        rules = generate_association_rules(patterns, total_transactions, config)
     logger.info(f"   • Rules: {len(rules)}")
     
-    save_rules_to_csv(rules, output_file, config)
+    if config.get('prune_redundant'):
+        rules = prune_redundant_rules(rules)
+        logger.info(f"   • Rules sau khi loại rules dư thừa: {len(rules)}")
+    
+    rules = RuleSet.from_rules(rules)
+    if config.get('export_csv', True):
+        save_rules_to_csv(rules, output_file, config)
+    # Ghi model nhị phân sau CSV: generate_routes.load_rules chỉ dùng nó khi
+    # nó không cũ hơn CSV
+    artifact_file = rules_artifact_path(output_file)
+    rules.save(artifact_file)
+    logger.info(f"   • Đã lưu model nhị phân: {artifact_file}")
     return rules
 
 
@@ -85,44 +277,15 @@ def train_fp_growth(train_df):
     district_rules = train_single_type(train_df, 'district', DISTRICT_CONFIG, 'QUẬN', OUTPUT_DISTRICT_RULES)
     road_rules = train_single_type(train_df, 'road_name', ROAD_CONFIG, 'ĐƯỜNG', OUTPUT_ROAD_RULES)
     
-    logger.info(f"\n✅ Đã lưu: {OUTPUT_DISTRICT_RULES}, {OUTPUT_ROAD_RULES}")
+    logger.info(f"\n✅ Đã lưu: {rules_artifact_path(OUTPUT_DISTRICT_RULES)}, {rules_artifact_path(OUTPUT_ROAD_RULES)}")
     return district_rules, road_rules
 
 
-def predict_next_locations(current_path, rules, top_k=5):
-    """Dự đoán vị trí tiếp theo - ưu tiên rules khớp SEQUENCE"""
-    if not current_path:
-        return []
-    
-    candidates = {}
-    current_set = set(current_path)
-    
-    for rule in rules:
-        ant = rule['antecedents'] if isinstance(rule['antecedents'], set) else set(rule['antecedents'])
-        cons = rule['consequents'] if isinstance(rule['consequents'], set) else set(rule['consequents'])
-        
-        # Kiểm tra rule có match không
-        if not ant.issubset(current_set):
-            continue
-        
-        # Tính score dựa trên độ gần với tail của current_path
-        base_score = rule['confidence'] * rule.get('quality_score', rule['lift'])
-        
-        # Bonus nếu antecedents xuất hiện gần cuối path
-        recent_items = set(current_path[-min(3, len(current_path)):])
-        overlap = len(ant & recent_items) / len(ant) if ant else 0
-        position_bonus = 1.0 + overlap  # Bonus 0-100%
-        
-        for location in cons:
-            if location not in current_set:
-                score = base_score * position_bonus
-                candidates[location] = candidates.get(location, 0) + score
-    
-    return [loc for loc, _ in sorted(candidates.items(), key=lambda x: x[1], reverse=True)[:top_k]]
-
-
 def parse_rules(rules_list):
-    """Parse rules thành format chuẩn"""
+    """Parse rules thành format chuẩn (RuleSet được dùng trực tiếp)"""
+    if isinstance(rules_list, RuleSet):
+        return rules_list
+    
     parsed = []
     for rule in rules_list:
         try:
@@ -146,9 +309,12 @@ def parse_rules(rules_list):
 
 def extract_test_routes(test_df, column_name, min_length=3):
     """Trích xuất test routes - loại duplicates liền kề như train"""
+    if isinstance(test_df, TripTransactions):
+        return test_df.ordered(column_name, min_length)
+    
     test_routes = []
     for _, group in test_df.groupby('trip_id'):
-        items = group[column_name].dropna().tolist()
+        items = _column_items(group, column_name)
         
         # Loại duplicates liền kề giống như prepare_transactions
         deduped = []
@@ -162,22 +328,29 @@ def extract_test_routes(test_df, column_name, min_length=3):
     return test_routes
 
 
-def calculate_precision_at_k(test_routes, parsed_rules):
-    """Tính Precision@K, MRR và Hit Rate cho test routes"""
+def _evaluate_routes(test_routes, rule_index, log_progress=False):
+    """
+    Đếm kết quả dự đoán trên một nhóm test routes.
+    
+    Returns:
+        Tuple (correct_1, correct_3, correct_5, total, hits_at_5, reciprocal_ranks)
+    """
     correct_at_1 = correct_at_3 = correct_at_5 = 0
     total_predictions = 0
     reciprocal_ranks = []
     hits_at_5 = 0
     
     for idx, route in enumerate(test_routes, 1):
-        if idx % 100 == 0:
+        if log_progress and idx % 100 == 0:
             logger.info(f"      Progress: {idx}/{len(test_routes)} routes...")
         
+        # Path được mở rộng từng bước, không dựng lại route[:i+1]
+        predictor = PathPredictor(rule_index)
         for i in range(len(route)-1):
-            current_path = route[:i+1]
+            predictor.extend(route[i])
             actual_next = route[i+1]
             
-            predictions = predict_next_locations(current_path, parsed_rules, top_k=10)
+            predictions = predictor.predict(top_k=10)
             
             if predictions:
                 total_predictions += 1
@@ -204,6 +377,63 @@ def calculate_precision_at_k(test_routes, parsed_rules):
                 if actual_next in predictions[:5]:
                     hits_at_5 += 1
     
+    return correct_at_1, correct_at_3, correct_at_5, total_predictions, hits_at_5, reciprocal_ranks
+
+
+_worker_rule_index = None
+
+
+def _init_evaluation_worker(rule_index):
+    """Initializer cho worker đánh giá: nhận chỉ mục rules một lần"""
+    global _worker_rule_index
+    _worker_rule_index = rule_index
+
+
+def _evaluate_shard(test_routes):
+    """Worker: đánh giá một shard test routes"""
+    return _evaluate_routes(test_routes, _worker_rule_index)
+
+
+def calculate_precision_at_k(test_routes, parsed_rules, n_workers=1):
+    """
+    Tính Precision@K, MRR và Hit Rate cho test routes.
+    
+    Với n_workers > 1, test routes được chia thành các shards liên tiếp và
+    đánh giá trên process pool (RuleIndex gửi một lần mỗi worker); các bộ đếm
+    được gộp theo thứ tự shard nên metrics giống hệt khi chạy tuần tự.
+    """
+    # Dựng chỉ mục rules một lần cho mọi truy vấn (và mọi worker)
+    rule_index = parsed_rules if isinstance(parsed_rules, RuleIndex) else RuleIndex(parsed_rules)
+    
+    if n_workers > 1 and len(test_routes) > 1:
+        n_shards = min(len(test_routes), n_workers * 4)
+        shard_size = -(-len(test_routes) // n_shards)
+        shards = [test_routes[i:i + shard_size] for i in range(0, len(test_routes), shard_size)]
+        
+        correct_at_1 = correct_at_3 = correct_at_5 = 0
+        total_predictions = hits_at_5 = 0
+        reciprocal_ranks = []
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_evaluation_worker,
+            initargs=(rule_index,)
+        ) as executor:
+            for shard, counts in zip(shards, executor.map(_evaluate_shard, shards)):
+                correct_at_1 += counts[0]
+                correct_at_3 += counts[1]
+                correct_at_5 += counts[2]
+                total_predictions += counts[3]
+                hits_at_5 += counts[4]
+                reciprocal_ranks.extend(counts[5])
+                # Log mỗi khi vượt qua một mốc 100 routes (như chế độ tuần tự)
+                if (done + len(shard)) // 100 > done // 100:
+                    logger.info(f"      Progress: {done + len(shard)}/{len(test_routes)} routes...")
+                done += len(shard)
+    else:
+        (correct_at_1, correct_at_3, correct_at_5, total_predictions, hits_at_5,
+         reciprocal_ranks) = _evaluate_routes(test_routes, rule_index, log_progress=True)
+    
     if total_predictions > 0:
         p1 = correct_at_1 / total_predictions * 100
         p3 = correct_at_3 / total_predictions * 100
@@ -256,12 +486,12 @@ def log_summary(avg_p5, avg_p1, avg_p3, avg_mrr, avg_hit_rate):
         logger.info(f"   ❌ Độ chính xác THẤP (P@5 <10%)")
 
 
-def test_single_type(test_df, column_name, rules, icon, label):
+def test_single_type(test_df, column_name, rules, icon, label, n_workers=1):
     """Test và log metrics cho một loại (quận/đường)"""
     test_routes = extract_test_routes(test_df, column_name)
     logger.info(f"   • Số routes test: {len(test_routes)}")
     
-    metrics = calculate_precision_at_k(test_routes, parse_rules(rules))
+    metrics = calculate_precision_at_k(test_routes, parse_rules(rules), n_workers=n_workers)
     log_metrics(metrics, icon, label)
     return metrics
 
@@ -270,8 +500,12 @@ def evaluate_on_test_data(test_df, district_rules, road_rules):
     """Đánh giá độ chính xác trên tập test"""
     logger.info("\n" + "="*70 + "\n🎯 PHẦN 3: TEST ĐỘ CHÍNH XÁC (TẬP TEST 20%)\n" + "="*70)
     
-    district_metrics = test_single_type(test_df, 'district', district_rules, '📍', 'LUẬT QUẬN')
-    road_metrics = test_single_type(test_df, 'road_name', road_rules, '🛣️ ', 'LUẬT ĐƯỜNG')
+    district_metrics = test_single_type(
+        test_df, 'district', district_rules, '📍', 'LUẬT QUẬN', n_workers=DISTRICT_CONFIG.get('n_jobs', 1)
+    )
+    road_metrics = test_single_type(
+        test_df, 'road_name', road_rules, '🛣️ ', 'LUẬT ĐƯỜNG', n_workers=ROAD_CONFIG.get('n_jobs', 1)
+    )
     
     avg_p1 = (district_metrics['p1'] + road_metrics['p1']) / 2
     avg_p3 = (district_metrics['p3'] + road_metrics['p3']) / 2
@@ -294,7 +528,7 @@ def evaluate_on_test_data(test_df, district_rules, road_rules):
     }
 
 
-def generate_report(train_df, test_df, district_rules, road_rules, metrics):
+def generate_report(train_trips, test_trips, district_rules, road_rules, metrics):
     """Tạo báo cáo markdown chi tiết"""
     from datetime import datetime
     
@@ -332,8 +566,8 @@ def generate_report(train_df, test_df, district_rules, road_rules, metrics):
 
 | Thông Tin | Train Set | Test Set | Tổng |
 |-----------|-----------|----------|------|
-| **Routes** | {train_df['trip_id'].nunique():,} | {test_df['trip_id'].nunique():,} | {train_df['trip_id'].nunique() + test_df['trip_id'].nunique():,} |
-| **Transactions** | {len(train_df):,} | {len(test_df):,} | {len(train_df) + len(test_df):,} |
+| **Routes** | {len(train_trips):,} | {len(test_trips):,} | {len(train_trips) + len(test_trips):,} |
+| **Transactions** | {train_trips.n_rows:,} | {test_trips.n_rows:,} | {train_trips.n_rows + test_trips.n_rows:,} |
 | **Tỉ lệ chia** | 80% | 20% | 100% |
 
 ### 🔧 Cấu Hình
@@ -555,7 +789,7 @@ Model hiện tại đã đạt hiệu suất {rating_emoji} **{rating.split()[1]
 **Timestamp**: {timestamp}  
 **Version**: 3.0
 """
-    
+
     with open(report_path, 'w', encoding='utf-8') as f:
         f.write(report)
     
@@ -569,22 +803,22 @@ def main():
     logger.info("\nQuy trình: 1.Chia 80/20 → 2.Train → 3.Test → 4.Báo cáo")
     
     try:
-        train_df, test_df = split_data_by_routes(DATA_FILE, TRAIN_RATIO)
-        district_rules, road_rules = train_fp_growth(train_df)
-        metrics = evaluate_on_test_data(test_df, district_rules, road_rules)
+        train_trips, test_trips = split_data_by_routes(DATA_FILE, TRAIN_RATIO)
+        district_rules, road_rules = train_fp_growth(train_trips)
+        metrics = evaluate_on_test_data(test_trips, district_rules, road_rules)
         
         logger.info("\n" + "="*70 + "\n📊 TÓM TẮT KẾT QUẢ\n" + "="*70)
-        logger.info(f"✓ Train: {train_df['trip_id'].nunique()} routes | Test: {test_df['trip_id'].nunique()} routes")
+        logger.info(f"✓ Train: {len(train_trips)} routes | Test: {len(test_trips)} routes")
         logger.info(f"✓ Luật: {len(district_rules)} quận, {len(road_rules)} đường")
         logger.info(f"✓ P@1: {metrics['average']['p1']:.2f}% | P@5: {metrics['average']['p5']:.2f}% | MRR: {metrics['average']['mrr']:.2f}%")
         
         # Tạo báo cáo chi tiết
-        report_path = generate_report(train_df, test_df, district_rules, road_rules, metrics)
+        report_path = generate_report(train_trips, test_trips, district_rules, road_rules, metrics)
         
         logger.info("\n" + "="*70 + "\n✅ HOÀN THÀNH!\n" + "="*70)
         logger.info(f"📄 Xem báo cáo chi tiết tại: {report_path}")
         logger.info(f"\n💡 Để tạo routes từ orders, chạy: python generate_routes.py")
-        
+    
     except Exception as e:
         logger.error(f"\n❌ Lỗi: {e}")
         import traceback
@@ -0,0 +1,183 @@
+"""
+Prediction Module
+Dự đoán vị trí tiếp theo từ association rules, dùng chung cho main.py
+(đánh giá) và generate_routes.py (sinh tuyến đường).
+
+RuleIndex là chỉ mục ngược từ item của antecedents tới các rules: một truy
+vấn chỉ chạm tới các rules có chung item với path hiện tại, và một rule
+khớp khi bộ đếm số items antecedents đã gặp bằng độ dài antecedents.
+"""
+
+
+class RuleIndex:
+    """
+    Chỉ mục ngược item -> rules để tìm nhanh các rules có antecedents ⊆ path.
+    """
+    def __init__(self, rules):
+        """
+        Args:
+            rules: List các rules dạng dictionary hoặc RuleSet
+        """
+        self.antecedents = []
+        self.consequents = []
+        self.base_scores = []
+        self.item_rules = {}
+        # Rules có antecedents rỗng luôn khớp
+        self.unconditional = []
+        
+        for idx, rule in enumerate(rules):
+            antecedent = frozenset(rule['antecedents'])
+            self.antecedents.append(antecedent)
+            self.consequents.append(tuple(rule['consequents']))
+            self.base_scores.append(rule['confidence'] * rule.get('quality_score', rule['lift']))
+            
+            if not antecedent:
+                self.unconditional.append(idx)
+            for item in antecedent:
+                self.item_rules.setdefault(item, []).append(idx)
+    
+    def __len__(self):
+        return len(self.antecedents)
+    
+    def matching_rules(self, items):
+        """
+        Tìm các rules có antecedents là tập con của items.
+        
+        Args:
+            items: Set các items (path hiện tại)
+        
+        Returns:
+            List chỉ số các rules khớp, tăng dần (đúng thứ tự rules gốc)
+        """
+        hits = {}
+        item_rules = self.item_rules
+        for item in items:
+            for idx in item_rules.get(item, ()):
+                hits[idx] = hits.get(idx, 0) + 1
+        
+        antecedents = self.antecedents
+        matched = [idx for idx, count in hits.items() if count == len(antecedents[idx])]
+        matched.extend(self.unconditional)
+        matched.sort()
+        return matched
+    
+    def score_candidates(self, current_path, matched=None, current_set=None):
+        """
+        Cộng dồn điểm cho các vị trí ứng viên từ các rules khớp.
+        
+        Args:
+            current_path: List các items đã đi qua (theo thứ tự)
+            matched: Chỉ số các rules khớp, tăng dần (mặc định tự tìm)
+            current_set: set(current_path) nếu đã có sẵn
+        
+        Returns:
+            Dictionary {location: score} theo thứ tự xuất hiện
+        """
+        if current_set is None:
+            current_set = set(current_path)
+        if matched is None:
+            matched = self.matching_rules(current_set)
+        
+        # Bonus nếu antecedents xuất hiện gần cuối path
+        recent_items = set(current_path[-min(3, len(current_path)):])
+        
+        candidates = {}
+        for idx in matched:
+            ant = self.antecedents[idx]
+            overlap = len(ant & recent_items) / len(ant) if ant else 0
+            position_bonus = 1.0 + overlap  # Bonus 0-100%
+            score = self.base_scores[idx] * position_bonus
+            
+            for location in self.consequents[idx]:
+                if location not in current_set:
+                    candidates[location] = candidates.get(location, 0) + score
+        
+        return candidates
+
+
+class PathPredictor:
+    """
+    Trạng thái dự đoán cho một path được mở rộng từng bước.
+    
+    Mỗi lần extend(item) chỉ cập nhật bộ đếm của các rules chứa item
+    (qua RuleIndex.item_rules) và thêm các rules vừa khớp đủ antecedents,
+    thay vì tìm lại từ đầu cho cả path. predict() cho kết quả giống hệt
+    predict_next_locations(path, ...).
+    """
+    def __init__(self, rules, path=None):
+        """
+        Args:
+            rules: RuleIndex (hoặc RuleSet / list rules, sẽ được dựng index)
+            path: Các items ban đầu của path
+        """
+        self.index = rules if isinstance(rules, RuleIndex) else RuleIndex(rules)
+        self.path = []
+        self.current_set = set()
+        self._hits = {}
+        # Rules đã khớp, luôn giữ tăng dần
+        self._matched = list(self.index.unconditional)
+        
+        for item in path or ():
+            self.extend(item)
+    
+    def extend(self, item):
+        """
+        Thêm một item vào cuối path.
+        
+        Args:
+            item: Vị trí vừa đi qua
+        """
+        self.path.append(item)
+        if item in self.current_set:
+            return
+        self.current_set.add(item)
+        
+        hits = self._hits
+        antecedents = self.index.antecedents
+        newly_matched = []
+        for idx in self.index.item_rules.get(item, ()):
+            count = hits.get(idx, 0) + 1
+            hits[idx] = count
+            if count == len(antecedents[idx]):
+                newly_matched.append(idx)
+        
+        if newly_matched:
+            self._matched = sorted(self._matched + newly_matched)
+    
+    def predict(self, top_k=5):
+        """
+        Dự đoán vị trí tiếp theo cho path hiện tại.
+        
+        Returns:
+            List tối đa top_k vị trí, điểm giảm dần
+        """
+        if not self.path:
+            return []
+        candidates = self.index.score_candidates(self.path, self._matched, self.current_set)
+        return top_locations(candidates, top_k)
+
+
+def top_locations(candidates, top_k):
+    """Lấy top_k vị trí có điểm cao nhất (giữ thứ tự xuất hiện khi bằng điểm)."""
+    return [loc for loc, _ in sorted(candidates.items(), key=lambda x: x[1], reverse=True)[:top_k]]
+
+
+def predict_next_locations(current_path, rules, top_k=5):
+    """
+    Dự đoán vị trí tiếp theo - ưu tiên rules khớp SEQUENCE.
+    
+    Args:
+        current_path: List các items đã đi qua (theo thứ tự)
+        rules: RuleIndex (nên dựng sẵn một lần), RuleSet hoặc list các rules
+        top_k: Số vị trí trả về
+    
+    Returns:
+        List tối đa top_k vị trí, điểm giảm dần
+    """
+    if not current_path:
+        return []
+    
+    if not isinstance(rules, RuleIndex):
+        rules = RuleIndex(rules)
+    
+    return top_locations(rules.score_candidates(current_path), top_k)
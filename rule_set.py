@@ -0,0 +1,318 @@
+"""
+Rule Set Module
+Lưu association rules dạng cột (columnar) thay cho list các dictionaries.
+Antecedents / consequents được mã hóa thành ID số nguyên và lưu bằng mảng
+offsets (giống CSR); support, confidence, lift, quality_score là các mảng
+float. Mọi module (association_rules, data_handler, main, generate_routes)
+đều dùng được RuleSet như một iterable các rules.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Artifact nhị phân: MAGIC | version (uint32) | độ dài header (uint32) |
+# header JSON (vocabulary, vị trí các mảng) | các mảng căn lề 8 bytes
+RULESET_MAGIC = b'FPRULES\0'
+RULESET_VERSION = 1
+RULESET_EXTENSION = '.rules'
+_PREAMBLE = struct.Struct('<8sII')
+_ARRAY_COLUMNS = (
+    'antecedent_offsets', 'antecedent_items',
+    'consequent_offsets', 'consequent_items',
+    'support', 'confidence', 'lift', 'quality_score'
+)
+
+
+def rules_artifact_path(csv_path):
+    """Đường dẫn artifact nhị phân tương ứng với file rules CSV."""
+    return os.path.splitext(csv_path)[0] + RULESET_EXTENSION
+
+
+def _encode_itemsets(itemsets, item_ids, vocabulary):
+    """
+    Mã hóa list itemsets thành (offsets, items) kiểu CSR.
+    Items chưa có trong vocabulary được thêm vào cuối.
+    """
+    offsets = np.zeros(len(itemsets) + 1, dtype=np.int64)
+    encoded = []
+    for idx, itemset in enumerate(itemsets):
+        for item in itemset:
+            item_id = item_ids.get(item)
+            if item_id is None:
+                item_id = item_ids[item] = len(vocabulary)
+                vocabulary.append(item)
+            encoded.append(item_id)
+        offsets[idx + 1] = len(encoded)
+    return offsets, np.array(encoded, dtype=np.int32)
+
+
+class RuleSet:
+    """
+    Tập association rules lưu dạng cột.
+    
+    Rule thứ i có antecedents là
+    vocabulary[antecedent_items[antecedent_offsets[i]:antecedent_offsets[i+1]]]
+    (tương tự cho consequents) và metrics là support[i], confidence[i], ...
+    
+    Duyệt RuleSet trả về các rules dạng dictionary (antecedents /
+    consequents là set) giống generate_association_rules, nên các hàm cũ
+    nhận list rules vẫn dùng được.
+    """
+    def __init__(self, vocabulary, antecedent_offsets, antecedent_items,
+                 consequent_offsets, consequent_items, support, confidence, lift,
+                 quality_score=None):
+        """
+        Args:
+            vocabulary: List items (ID = vị trí trong list)
+            antecedent_offsets: np.ndarray int64 shape (n_rules + 1,)
+            antecedent_items: np.ndarray int32 các item IDs
+            consequent_offsets: np.ndarray int64 shape (n_rules + 1,)
+            consequent_items: np.ndarray int32 các item IDs
+            support, confidence, lift: np.ndarray float64 shape (n_rules,)
+            quality_score: np.ndarray float64 (mặc định confidence * lift)
+        """
+        self.vocabulary = list(vocabulary)
+        self.item_ids = {item: idx for idx, item in enumerate(self.vocabulary)}
+        self.antecedent_offsets = np.asarray(antecedent_offsets, dtype=np.int64)
+        self.antecedent_items = np.asarray(antecedent_items, dtype=np.int32)
+        self.consequent_offsets = np.asarray(consequent_offsets, dtype=np.int64)
+        self.consequent_items = np.asarray(consequent_items, dtype=np.int32)
+        self.support = np.asarray(support, dtype=np.float64)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.lift = np.asarray(lift, dtype=np.float64)
+        if quality_score is None:
+            quality_score = self.confidence * self.lift
+        self.quality_score = np.asarray(quality_score, dtype=np.float64)
+    
+    @classmethod
+    def from_rules(cls, rules, vocabulary=None):
+        """
+        Tạo RuleSet từ list các rules dạng dictionary.
+        
+        Args:
+            rules: Iterable các rules (antecedents, consequents, support,
+                confidence, lift và tùy chọn quality_score)
+            vocabulary: List items có sẵn (items mới được thêm vào cuối)
+        
+        Returns:
+            RuleSet
+        """
+        if isinstance(rules, RuleSet):
+            return rules
+        rules = list(rules)
+        vocabulary = list(vocabulary or [])
+        item_ids = {item: idx for idx, item in enumerate(vocabulary)}
+        
+        antecedent_offsets, antecedent_items = _encode_itemsets(
+            [rule['antecedents'] for rule in rules], item_ids, vocabulary
+        )
+        consequent_offsets, consequent_items = _encode_itemsets(
+            [rule['consequents'] for rule in rules], item_ids, vocabulary
+        )
+        return cls(
+            vocabulary,
+            antecedent_offsets, antecedent_items,
+            consequent_offsets, consequent_items,
+            [rule.get('support', 0.0) for rule in rules],
+            [rule['confidence'] for rule in rules],
+            [rule['lift'] for rule in rules],
+            [rule.get('quality_score', rule['confidence'] * rule['lift']) for rule in rules]
+        )
+    
+    def save(self, filepath):
+        """
+        Ghi RuleSet ra artifact nhị phân có version (xem RULESET_MAGIC).
+        
+        Args:
+            filepath: Đường dẫn file đầu ra (thường có đuôi .rules)
+        """
+        arrays = {}
+        position = 0
+        for name in _ARRAY_COLUMNS:
+            array = np.ascontiguousarray(getattr(self, name))
+            arrays[name] = (array, position)
+            position += (array.nbytes + 7) // 8 * 8
+        
+        header = json.dumps({
+            'n_rules': len(self),
+            'vocabulary': self.vocabulary,
+            'arrays': {
+                name: [array.dtype.str, offset, len(array)]
+                for name, (array, offset) in arrays.items()
+            }
+        }, ensure_ascii=False).encode('utf-8')
+        # Phần dữ liệu bắt đầu ở vị trí chia hết cho 8
+        header += b' ' * (-(_PREAMBLE.size + len(header)) % 8)
+        
+        with open(filepath, 'wb') as file:
+            file.write(_PREAMBLE.pack(RULESET_MAGIC, RULESET_VERSION, len(header)))
+            file.write(header)
+            for array, _ in arrays.values():
+                file.write(array.tobytes())
+                file.write(b'\0' * (-array.nbytes % 8))
+    
+    @classmethod
+    def load(cls, filepath, use_mmap=True):
+        """
+        Đọc RuleSet từ artifact nhị phân.
+        
+        Args:
+            filepath: Đường dẫn file .rules
+            use_mmap: Ánh xạ file vào bộ nhớ (các mảng chỉ đọc, không copy)
+        
+        Returns:
+            RuleSet
+        """
+        with open(filepath, 'rb') as file:
+            if use_mmap:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = file.read()
+        
+        if len(buffer) < _PREAMBLE.size:
+            raise ValueError(f"'{filepath}' không phải artifact rules")
+        magic, version, header_len = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != RULESET_MAGIC:
+            raise ValueError(f"'{filepath}' không phải artifact rules")
+        if version != RULESET_VERSION:
+            raise ValueError(f"Không hỗ trợ artifact rules version {version} (cần {RULESET_VERSION})")
+        
+        header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+        data_start = _PREAMBLE.size + header_len
+        arrays = {
+            name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=length,
+                                offset=data_start + offset)
+            for name, (dtype, offset, length) in header['arrays'].items()
+        }
+        return cls(header['vocabulary'], **arrays)
+    
+    def __len__(self):
+        return len(self.confidence)
+    
+    def __getitem__(self, idx):
+        """Lấy rule thứ idx dạng dictionary."""
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("rule index out of range")
+        return self._rule_dict(idx)
+    
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._rule_dict(idx)
+    
+    def _rule_dict(self, idx):
+        return {
+            'antecedents': set(self.antecedents(idx)),
+            'consequents': set(self.consequents(idx)),
+            'support': float(self.support[idx]),
+            'confidence': float(self.confidence[idx]),
+            'lift': float(self.lift[idx]),
+            'quality_score': float(self.quality_score[idx]),
+            'complexity': int(
+                self.antecedent_offsets[idx + 1] - self.antecedent_offsets[idx]
+                + self.consequent_offsets[idx + 1] - self.consequent_offsets[idx]
+            )
+        }
+    
+    def antecedent_ids(self, idx):
+        """Item IDs của antecedents của rule thứ idx."""
+        return self.antecedent_items[self.antecedent_offsets[idx]:self.antecedent_offsets[idx + 1]]
+    
+    def consequent_ids(self, idx):
+        """Item IDs của consequents của rule thứ idx."""
+        return self.consequent_items[self.consequent_offsets[idx]:self.consequent_offsets[idx + 1]]
+    
+    def antecedents(self, idx):
+        """List items antecedents của rule thứ idx."""
+        vocabulary = self.vocabulary
+        return [vocabulary[item_id] for item_id in self.antecedent_ids(idx).tolist()]
+    
+    def consequents(self, idx):
+        """List items consequents của rule thứ idx."""
+        vocabulary = self.vocabulary
+        return [vocabulary[item_id] for item_id in self.consequent_ids(idx).tolist()]
+    
+    def antecedent_lengths(self):
+        """Số items antecedents của mỗi rule (np.ndarray)."""
+        return np.diff(self.antecedent_offsets)
+    
+    def consequent_lengths(self):
+        """Số items consequents của mỗi rule (np.ndarray)."""
+        return np.diff(self.consequent_offsets)
+    
+    def to_rules(self):
+        """Chuyển về list các rules dạng dictionary."""
+        return list(self)
+    
+    def select(self, indices):
+        """
+        Lấy RuleSet con gồm các rules theo indices (giữ thứ tự indices).
+        
+        Args:
+            indices: Mảng chỉ số (int) hoặc mask (bool) shape (n_rules,)
+        
+        Returns:
+            RuleSet mới dùng chung vocabulary
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64, copy=False)
+        
+        antecedent_offsets, antecedent_items = _take_ragged(
+            self.antecedent_offsets, self.antecedent_items, indices
+        )
+        consequent_offsets, consequent_items = _take_ragged(
+            self.consequent_offsets, self.consequent_items, indices
+        )
+        return RuleSet(
+            self.vocabulary,
+            antecedent_offsets, antecedent_items,
+            consequent_offsets, consequent_items,
+            self.support[indices],
+            self.confidence[indices],
+            self.lift[indices],
+            self.quality_score[indices]
+        )
+    
+    def filter(self, min_confidence=None, min_lift=None, min_quality_score=None,
+               max_rules=None):
+        """
+        Lọc rules theo ngưỡng metrics (vector hóa) và giữ max_rules rules
+        có quality_score (rồi lift) cao nhất.
+        
+        Returns:
+            RuleSet mới, sắp xếp theo chất lượng nếu có max_rules
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_confidence is not None:
+            mask &= self.confidence >= min_confidence
+        if min_lift is not None:
+            mask &= self.lift >= min_lift
+        if min_quality_score is not None:
+            mask &= self.quality_score >= min_quality_score
+        indices = np.flatnonzero(mask)
+        
+        if max_rules is not None:
+            # Sort ổn định: quality_score giảm dần, sau đó lift giảm dần
+            order = np.lexsort((-self.lift[indices], -self.quality_score[indices]))
+            indices = indices[order[:max_rules]]
+        return self.select(indices)
+
+
+def _take_ragged(offsets, values, indices):
+    """Lấy các đoạn offsets[i]:offsets[i+1] theo indices, trả về (offsets, values) mới."""
+    starts = offsets[indices]
+    lengths = offsets[indices + 1] - starts
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    if new_offsets[-1] == 0:
+        return new_offsets, values[:0]
+    # Chỉ số phần tử = start của đoạn + vị trí trong đoạn
+    positions = np.arange(new_offsets[-1]) - np.repeat(new_offsets[:-1], lengths)
+    return new_offsets, values[np.repeat(starts, lengths) + positions]
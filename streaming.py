@@ -0,0 +1,124 @@
+"""
+Streaming Module
+Theo dõi frequent itemsets trên luồng trips trực tiếp bằng Lossy Counting
+(Manku & Motwani), không cần chạy lại mine_fp_tree trên toàn bộ lịch sử.
+Module này không phụ thuộc vào bất kỳ module nào khác ngoài thư viện chuẩn
+và association_rules.
+"""
+
+import math
+from itertools import combinations
+
+from association_rules import generate_association_rules
+
+
+class LossyCountingTracker:
+    """
+    Đếm xấp xỉ support của các itemsets (độ dài <= max_len) trên luồng trips.
+    
+    Bảo đảm với N trips đã nhận và sai số error (ε):
+    - Count ước lượng không vượt quá count thật và thiếu tối đa εN.
+    - Truy vấn với min_support s trả về MỌI itemset có support thật >= s
+      (không bỏ sót); itemset được trả về có support thật >= s - ε.
+    - Bộ nhớ: O(M / ε · log(εN)) entries, với M là số tập con độ dài
+      <= max_len của một trip.
+    """
+    def __init__(self, error=0.001, max_len=3):
+        """
+        Khởi tạo tracker.
+        
+        Args:
+            error: Sai số support cho phép ε (0-1)
+            max_len: Độ dài itemset tối đa được theo dõi
+        """
+        if not 0 < error < 1:
+            raise ValueError("error phải nằm trong khoảng (0, 1)")
+        self.error = error
+        self.max_len = max_len
+        self.bucket_width = math.ceil(1 / error)
+        self.n_transactions = 0
+        self.entries = {}  # itemset -> [count, delta]
+    
+    @property
+    def current_bucket(self):
+        """Chỉ số bucket hiện tại (bắt đầu từ 1)."""
+        return self.n_transactions // self.bucket_width + 1
+    
+    def add(self, transaction):
+        """
+        Nhận một trip mới.
+        
+        Args:
+            transaction: List các items của trip (quận hoặc đường)
+        """
+        items = list(dict.fromkeys(transaction))
+        delta = self.current_bucket - 1
+        entries = self.entries
+        
+        for length in range(1, min(self.max_len, len(items)) + 1):
+            for subset in combinations(items, length):
+                itemset = frozenset(subset)
+                entry = entries.get(itemset)
+                if entry is None:
+                    entries[itemset] = [1, delta]
+                else:
+                    entry[0] += 1
+        
+        self.n_transactions += 1
+        if self.n_transactions % self.bucket_width == 0:
+            self._prune()
+    
+    def add_many(self, transactions):
+        """
+        Nhận nhiều trips liên tiếp.
+        
+        Args:
+            transactions: Iterable các transactions
+        """
+        for transaction in transactions:
+            self.add(transaction)
+    
+    def _prune(self):
+        """Loại các entries có count + delta <= bucket hiện tại."""
+        bucket = self.n_transactions // self.bucket_width
+        self.entries = {
+            itemset: entry for itemset, entry in self.entries.items()
+            if entry[0] + entry[1] > bucket
+        }
+    
+    def frequent_itemsets(self, min_support):
+        """
+        Lấy các frequent itemsets hiện tại.
+        
+        Args:
+            min_support: Ngưỡng support dạng tỉ lệ (0-1), phải >= error
+        
+        Returns:
+            Dictionary chứa các itemsets (frozenset) và support count ước
+            lượng (int, sai số tối đa error * n_transactions)
+        """
+        if min_support < self.error:
+            raise ValueError("min_support phải >= error của tracker")
+        threshold = (min_support - self.error) * self.n_transactions
+        return {
+            itemset: count for itemset, (count, _) in self.entries.items()
+            if count >= threshold
+        }
+    
+    def generate_rules(self, config):
+        """
+        Sinh association rules từ trạng thái hiện tại.
+        
+        Args:
+            config: Dictionary cấu hình như DISTRICT_CONFIG / ROAD_CONFIG
+        
+        Returns:
+            List các rules (cùng định dạng với generate_association_rules)
+        """
+        if self.n_transactions == 0:
+            return []
+        return generate_association_rules(
+            self.frequent_itemsets(config['min_support']),
+            self.n_transactions,
+            config
+        )